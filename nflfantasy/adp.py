@@ -0,0 +1,387 @@
+'''
+
+# nflfantasy/adp.py
+# adp analytics and history built from mfl draft picks and adp
+
+'''
+
+import datetime
+import logging
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+
+class DraftAdp():
+    '''
+    Running adp aggregates over raw mfl draft picks
+    Grouped by (franchises, scoring), so new leagues only add to totals
+
+    '''
+
+    def __init__(self):
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.player_ids = []
+        self._pidx = {}
+        self._leagues = set()
+        self._slices = {}
+
+    @property
+    def slices(self):
+        return list(self._slices)
+
+    def _player_index(self, ids):
+        '''
+        Maps player ids to row numbers, adding unseen players
+
+        Args:
+            ids(ndarray): of str
+
+        Returns:
+            ndarray: of int
+
+        '''
+        uniq, inv = np.unique(ids, return_inverse=True)
+        for pid in uniq:
+            if pid not in self._pidx:
+                self._pidx[pid] = len(self.player_ids)
+                self.player_ids.append(pid)
+        return np.array([self._pidx[pid] for pid in uniq], dtype=np.int64)[inv]
+
+    def _slice(self, key, n_rounds):
+        '''
+        Gets aggregates for slice, growing arrays to current players and rounds
+
+        Args:
+            key(tuple): franchises, scoring
+            n_rounds(int):
+
+        Returns:
+            dict: of ndarray
+
+        '''
+        n = len(self.player_ids)
+        agg = self._slices.get(key)
+        if agg is None:
+            agg = {'leagues': 0, 'n': np.zeros(0), 'sum': np.zeros(0),
+                   'sumsq': np.zeros(0), 'min': np.zeros(0), 'max': np.zeros(0),
+                   'rounds': np.zeros((0, 0))}
+            self._slices[key] = agg
+        grow = n - len(agg['n'])
+        if grow > 0:
+            for k in ('n', 'sum', 'sumsq'):
+                agg[k] = np.concatenate([agg[k], np.zeros(grow)])
+            agg['min'] = np.concatenate([agg['min'], np.full(grow, np.inf)])
+            agg['max'] = np.concatenate([agg['max'], np.full(grow, -np.inf)])
+        rounds = agg['rounds']
+        if rounds.shape != (n, max(n_rounds, rounds.shape[1])):
+            grown = np.zeros((n, max(n_rounds, rounds.shape[1])))
+            grown[:rounds.shape[0], :rounds.shape[1]] = rounds
+            agg['rounds'] = grown
+        return agg
+
+    def ingest(self, picks, scoring=None, franchises=None):
+        '''
+        Adds picks from leagues not seen before
+
+        Args:
+            picks(iterable): of dict with league_id, player, round, pick
+            scoring(str): label for these leagues, 'ppr', etc.
+            franchises(int): league size, default inferred from picks per round
+
+        Returns:
+            int: number of leagues added
+
+        '''
+        picks = [p for p in picks if p['league_id'] not in self._leagues and p.get('player')]
+        if not picks:
+            return 0
+        leagues, linv = np.unique(np.array([str(p['league_id']) for p in picks]),
+                                  return_inverse=True)
+        rnd = np.array([int(p['round']) for p in picks])
+        pick = np.array([int(p['pick']) for p in picks])
+        pidx = self._player_index(np.array([str(p['player']) for p in picks]))
+
+        if franchises:
+            size = np.full(len(leagues), franchises)
+        else:
+            size = np.zeros(len(leagues), dtype=np.int64)
+            np.maximum.at(size, linv, pick)
+        fr = size[linv]
+        overall = (rnd - 1) * fr + pick
+
+        n = len(self.player_ids)
+        for league_size in np.unique(size):
+            m = fr == league_size
+            agg = self._slice((int(league_size), scoring), rnd[m].max())
+            p = pidx[m]
+            x = overall[m].astype(float)
+            agg['leagues'] += int((size == league_size).sum())
+            agg['n'] += np.bincount(p, minlength=n)
+            agg['sum'] += np.bincount(p, weights=x, minlength=n)
+            agg['sumsq'] += np.bincount(p, weights=x * x, minlength=n)
+            np.minimum.at(agg['min'], p, x)
+            np.maximum.at(agg['max'], p, x)
+            n_rounds = agg['rounds'].shape[1]
+            agg['rounds'] += np.bincount(p * n_rounds + rnd[m] - 1,
+                                         minlength=n * n_rounds).reshape(n, n_rounds)
+
+        self._leagues.update(p['league_id'] for p in picks)
+        return len(leagues)
+
+    def _combined(self, franchises=None, scoring=None):
+        '''
+        Sums aggregates of matching slices
+
+        Returns:
+            dict: of ndarray
+
+        '''
+        keys = [k for k in self._slices
+                if (franchises is None or k[0] == franchises) and
+                (scoring is None or k[1] == scoring)]
+        n = len(self.player_ids)
+        n_rounds = max([self._slices[k]['rounds'].shape[1] for k in keys] or [0])
+        total = {'leagues': 0, 'n': np.zeros(n), 'sum': np.zeros(n), 'sumsq': np.zeros(n),
+                 'min': np.full(n, np.inf), 'max': np.full(n, -np.inf),
+                 'rounds': np.zeros((n, n_rounds))}
+        for k in keys:
+            agg = self._slice(k, n_rounds)
+            total['leagues'] += agg['leagues']
+            for stat in ('n', 'sum', 'sumsq', 'rounds'):
+                total[stat] += agg[stat]
+            total['min'] = np.minimum(total['min'], agg['min'])
+            total['max'] = np.maximum(total['max'], agg['max'])
+        return total
+
+    def summary(self, franchises=None, scoring=None):
+        '''
+        adp, stdev, min/max pick and percent drafted for each player
+
+        Args:
+            franchises(int): league size, default all
+            scoring(str): default all
+
+        Returns:
+            DataFrame: sorted by adp
+
+        '''
+        agg = self._combined(franchises, scoring)
+        drafted = agg['n'] > 0
+        n = agg['n'][drafted]
+        adp = agg['sum'][drafted] / n
+        var = np.clip(agg['sumsq'][drafted] / n - adp * adp, 0, None)
+        df = pd.DataFrame({'player_id': np.array(self.player_ids, dtype=object)[drafted],
+                           'drafts': n.astype(int), 'adp': adp, 'stdev': np.sqrt(var),
+                           'min_pick': agg['min'][drafted].astype(int),
+                           'max_pick': agg['max'][drafted].astype(int),
+                           'pct_drafted': n / max(agg['leagues'], 1)})
+        return df.sort_values('adp').reset_index(drop=True)
+
+    def round_frequency(self, franchises=None, scoring=None, normalize=True):
+        '''
+        How often each player goes in each round
+
+        Args:
+            franchises(int): league size, default all
+            scoring(str): default all
+            normalize(bool): share of player's drafts rather than counts
+
+        Returns:
+            DataFrame: player_id x round
+
+        '''
+        agg = self._combined(franchises, scoring)
+        drafted = agg['n'] > 0
+        rounds = agg['rounds'][drafted]
+        if normalize:
+            rounds = rounds / agg['n'][drafted][:, None]
+        return pd.DataFrame(rounds, columns=range(1, rounds.shape[1] + 1),
+                            index=pd.Index(np.array(self.player_ids, dtype=object)[drafted],
+                                           name='player_id'))
+
+
+class AdpHistory():
+    '''
+    Daily mfl adp snapshots stored as per-player changes from prior snapshot
+    Indexed by (config, player_id, day), so trajectories and movers are
+    answered without replaying snapshots
+
+    '''
+
+    fields = ('adp', 'min_pick', 'max_pick', 'draft_pct')
+
+    def __init__(self, path):
+        '''
+
+        Args:
+            path(str): sqlite file
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.path = path
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS snapshots
+                           (config TEXT, day TEXT, players INTEGER, changes INTEGER,
+                            PRIMARY KEY (config, day))''')
+            con.execute('''CREATE TABLE IF NOT EXISTS deltas
+                           (config TEXT, player_id TEXT, day TEXT, adp REAL,
+                            min_pick REAL, max_pick REAL, draft_pct REAL,
+                            PRIMARY KEY (config, player_id, day))''')
+            con.execute('''CREATE TABLE IF NOT EXISTS current
+                           (config TEXT, player_id TEXT, adp REAL, min_pick REAL,
+                            max_pick REAL, draft_pct REAL,
+                            PRIMARY KEY (config, player_id))''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def config(franchises=12, ppr=1):
+        return '{}-{}'.format(franchises, ppr)
+
+    @staticmethod
+    def _values(player):
+        '''
+        Numeric values of mfl adp player
+
+        Args:
+            player(dict): from mfl Parser.adp
+
+        Returns:
+            tuple
+
+        '''
+        vals = []
+        for k in ('averagePick', 'minPick', 'maxPick', 'draftSelPct'):
+            try:
+                vals.append(round(float(player[k]), 2))
+            except (KeyError, TypeError, ValueError):
+                vals.append(None)
+        return tuple(vals)
+
+    def add_snapshot(self, players, franchises=12, ppr=1, day=None):
+        '''
+        Stores players whose adp changed since previous snapshot
+        Players no longer listed get a row of nulls
+
+        Args:
+            players(list): of dict from mfl Parser.adp
+            franchises(int): number of teams
+            ppr(int): 1 ppr, 0 std, -1 both
+            day(date): default today
+
+        Returns:
+            int: number of changes, None if day already captured
+
+        '''
+        config = self.config(franchises, ppr)
+        day = (day or datetime.date.today()).isoformat()
+        new = {str(p['id']): self._values(p) for p in players}
+        with self._connect() as con:
+            if con.execute('SELECT 1 FROM snapshots WHERE config = ? AND day = ?',
+                           (config, day)).fetchone():
+                logging.info('already have %s %s', config, day)
+                return None
+            old = {row[0]: tuple(row[1:]) for row in
+                   con.execute('''SELECT player_id, adp, min_pick, max_pick, draft_pct
+                                  FROM current WHERE config = ?''', (config,))}
+            changed = [(pid, vals) for pid, vals in new.items() if old.get(pid) != vals]
+            removed = [pid for pid in old if pid not in new]
+            con.executemany('INSERT INTO deltas VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [(config, pid, day) + vals for pid, vals in changed] +
+                            [(config, pid, day, None, None, None, None) for pid in removed])
+            con.executemany('INSERT OR REPLACE INTO current VALUES (?, ?, ?, ?, ?, ?)',
+                            [(config, pid) + vals for pid, vals in changed])
+            con.executemany('DELETE FROM current WHERE config = ? AND player_id = ?',
+                            [(config, pid) for pid in removed])
+            con.execute('INSERT INTO snapshots VALUES (?, ?, ?, ?)',
+                        (config, day, len(new), len(changed) + len(removed)))
+        return len(changed) + len(removed)
+
+    def capture(self, agent, franchises=12, ppr=1):
+        '''
+        Gets current adp with mfl Agent and stores today's snapshot
+
+        Args:
+            agent(Agent): mfl Agent
+            franchises(int): number of teams
+            ppr(int): 1 ppr, 0 std, -1 both
+
+        Returns:
+            int: number of changes, None if already captured today
+
+        '''
+        return self.add_snapshot(agent.adp(franchises, ppr), franchises, ppr)
+
+    def trajectory(self, player_id, franchises=12, ppr=1):
+        '''
+        Days on which player's adp changed, with new values
+
+        Args:
+            player_id(str): mfl player id
+            franchises(int): number of teams
+            ppr(int): 1 ppr, 0 std, -1 both
+
+        Returns:
+            DataFrame: indexed by day
+
+        '''
+        q = '''SELECT day, adp, min_pick, max_pick, draft_pct FROM deltas
+               WHERE config = ? AND player_id = ? ORDER BY day'''
+        with self._connect() as con:
+            rows = con.execute(q, (self.config(franchises, ppr), str(player_id))).fetchall()
+        return pd.DataFrame(rows, columns=('day',) + self.fields).set_index('day')
+
+    def as_of(self, day, franchises=12, ppr=1):
+        '''
+        adp of every listed player on day
+
+        Args:
+            day(date):
+            franchises(int): number of teams
+            ppr(int): 1 ppr, 0 std, -1 both
+
+        Returns:
+            DataFrame: indexed by player_id
+
+        '''
+        q = '''SELECT player_id, adp, min_pick, max_pick, draft_pct FROM deltas d
+               WHERE config = ? AND adp IS NOT NULL
+               AND day = (SELECT max(day) FROM deltas
+                          WHERE config = d.config AND player_id = d.player_id AND day <= ?)'''
+        with self._connect() as con:
+            rows = con.execute(q, (self.config(franchises, ppr), day.isoformat())).fetchall()
+        return pd.DataFrame(rows, columns=('player_id',) + self.fields).set_index('player_id')
+
+    def movers(self, days=7, franchises=12, ppr=1, day=None):
+        '''
+        Change in adp over days, positive change means player is going earlier
+
+        Args:
+            days(int): length of window
+            franchises(int): number of teams
+            ppr(int): 1 ppr, 0 std, -1 both
+            day(date): end of window, default latest snapshot
+
+        Returns:
+            DataFrame: sorted from biggest riser to biggest faller
+
+        '''
+        if day is None:
+            with self._connect() as con:
+                latest = con.execute('SELECT max(day) FROM snapshots WHERE config = ?',
+                                     (self.config(franchises, ppr),)).fetchone()[0]
+            if not latest:
+                return pd.DataFrame(columns=['adp_then', 'adp', 'change'])
+            day = datetime.date.fromisoformat(latest)
+        then = self.as_of(day - datetime.timedelta(days=days), franchises, ppr)['adp']
+        now = self.as_of(day, franchises, ppr)['adp']
+        df = pd.concat([then.rename('adp_then'), now], axis=1, join='inner')
+        df['change'] = df['adp_then'] - df['adp']
+        return df.sort_values('change', ascending=False)
+
+
+if __name__ == '__main__':
+    pass
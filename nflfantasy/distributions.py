@@ -0,0 +1,220 @@
+'''
+
+# nflfantasy/distributions.py
+# vectorized player scoring distributions fit from fantasymath quantiles
+
+'''
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+class PlayerDistributions():
+    '''
+    Piecewise-linear quantile fit of each player's scoring distribution
+    Knots are p5, p25, p50, p75, p95 plus tails extended with std
+
+    '''
+
+    quantile_keys = ('p5', 'p25', 'p50', 'p75', 'p95')
+    probs = np.array([.001, .05, .25, .5, .75, .95, .999])
+
+    # distance in std from p5 to p.1 (and p95 to p99.9) for a normal
+    tail_z = 3.090 - 1.645
+
+    def __init__(self, names, knots):
+        '''
+
+        Args:
+            names(list): of str
+            knots(ndarray): players x len(probs), increasing along rows
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.names = list(names)
+        self.knots = np.asarray(knots, dtype=float)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_distributions(cls, dists, key='name'):
+        '''
+        Fits players from fantasymath Parser.distribution results
+
+        Args:
+            dists(list): of dict, or dict of player_code: dict
+            key(str): field used as name when dists is a list
+
+        Returns:
+            PlayerDistributions
+
+        '''
+        if isinstance(dists, dict):
+            names, rows = list(dists.keys()), list(dists.values())
+        else:
+            names, rows = [d[key] for d in dists], list(dists)
+        q = np.array([[d.get(k, np.nan) for k in cls.quantile_keys] for d in rows],
+                     dtype=float).reshape(len(rows), len(cls.quantile_keys))
+        std = np.array([d.get('std', np.nan) for d in rows], dtype=float)
+
+        # if std is missing, use std of normal with same p5-p95 spread
+        std = np.where(np.isnan(std), (q[:, -1] - q[:, 0]) / 3.29, std)
+        lo = q[:, 0] - cls.tail_z * std
+        hi = q[:, -1] + cls.tail_z * std
+        knots = np.column_stack([lo, q, hi])
+        bad = np.isnan(knots).any(axis=1)
+        if bad.any():
+            logging.warning('dropping %s players without quantiles', bad.sum())
+            names = [name for name, b in zip(names, bad) if not b]
+            knots = knots[~bad]
+
+        # quantiles must strictly increase for interpolation
+        knots = np.maximum.accumulate(knots, axis=1)
+        knots = knots + np.arange(knots.shape[1]) * 1e-6
+        return cls(names, knots)
+
+    def subset(self, names):
+        '''
+        Distributions for some players
+
+        Args:
+            names(list): of str
+
+        Returns:
+            PlayerDistributions
+
+        '''
+        idx = [self.index[name] for name in names]
+        return PlayerDistributions([self.names[i] for i in idx], self.knots[idx])
+
+    def cdf(self, x):
+        '''
+        Evaluates every player's cdf
+
+        Args:
+            x(ndarray): 1-D points
+
+        Returns:
+            ndarray: players x points
+
+        '''
+        x = np.asarray(x, dtype=float)[None, :, None]
+        lo = self.knots[:, None, :-1]
+        hi = self.knots[:, None, 1:]
+        frac = np.clip((x - lo) / (hi - lo), 0, 1)
+        f = (frac * np.diff(self.probs)).sum(axis=2)
+        f += self.probs[0] * (x[..., 0] >= self.knots[:, :1])
+        f += (1 - self.probs[-1]) * (x[..., 0] >= self.knots[:, -1:])
+        return f
+
+    def ppf(self, u):
+        '''
+        Evaluates quantile function, column j of u is for player j
+
+        Args:
+            u(ndarray): samples x players of probabilities
+
+        Returns:
+            ndarray: samples x players
+
+        '''
+        u = np.clip(u, self.probs[0], self.probs[-1])
+        idx = np.clip(np.searchsorted(self.probs, u, side='right'), 1, len(self.probs) - 1)
+        plo = self.probs[idx - 1]
+        frac = (u - plo) / (self.probs[idx] - plo)
+        cols = np.arange(len(self.names))
+        lo = self.knots[cols, idx - 1]
+        return lo + frac * (self.knots[cols, idx] - lo)
+
+    def sample(self, size, rng=None):
+        '''
+        Draws independent outcomes
+
+        Args:
+            size(int): number of samples
+            rng(Generator): numpy random generator
+
+        Returns:
+            ndarray: samples x players
+
+        '''
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.ppf(rng.random((size, len(self.names))))
+
+    def mean(self):
+        '''
+        Expected points of each player
+
+        Returns:
+            ndarray
+
+        '''
+        mid = (self.knots[:, :-1] + self.knots[:, 1:]) / 2
+        return (mid * np.diff(self.probs)).sum(axis=1) + \
+            self.probs[0] * self.knots[:, 0] + (1 - self.probs[-1]) * self.knots[:, -1]
+
+    def _grid(self, grid_size):
+        '''
+        cdf on common grid of all players
+
+        Returns:
+            tuple: cdf increments and cdf at bin midpoints, players x bins
+
+        '''
+        grid = np.linspace(self.knots.min(), self.knots.max(), grid_size + 1)
+        f = self.cdf(grid)
+        return np.diff(f, axis=1), (f[:, :-1] + f[:, 1:]) / 2
+
+    def prob_matrix(self, grid_size=512):
+        '''
+        Probability that each player outscores each other player
+        Assumes independence, computed as one matrix product over a common grid
+
+        Args:
+            grid_size(int): number of bins
+
+        Returns:
+            ndarray: players x players, [i, j] is P(player i > player j)
+
+        '''
+        df, fmid = self._grid(grid_size)
+        p = df @ fmid.T
+        # enforce P(i > j) + P(j > i) == 1
+        return (p + 1 - p.T) / 2
+
+    def prob_frame(self, grid_size=512):
+        '''
+        prob_matrix as DataFrame indexed by player name
+
+        Returns:
+            DataFrame
+
+        '''
+        return pd.DataFrame(self.prob_matrix(grid_size), index=self.names,
+                            columns=self.names)
+
+    def best_prob(self, grid_size=512):
+        '''
+        Probability that each player has the highest score of the group
+
+        Args:
+            grid_size(int): number of bins
+
+        Returns:
+            ndarray
+
+        '''
+        df, fmid = self._grid(grid_size)
+        logf = np.log(np.clip(fmid, 1e-300, None))
+        others = logf.sum(axis=0) - logf
+        p = (df * np.exp(others)).sum(axis=1)
+        return p / p.sum()
+
+
+if __name__ == '__main__':
+    pass
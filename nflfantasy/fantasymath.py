@@ -5,47 +5,295 @@
 
 '''
 
+import hashlib
+import json
 import logging
+import os
+import sqlite3
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from sportscraper.scraper import RequestScraper
 
+from nflfantasy.ratelimit import TokenBucket
 
-class Scraper(RequestScraper):
+
+class DistributionCache():
     '''
+    Persistent sqlite cache of distribution responses
+    Stores whole responses keyed by sorted player codes + scoring params
+    and splits them per player, so overlapping batches can reuse players
 
     '''
 
-    def __init__(self, **kwargs):
+    def __init__(self, path, expire_hours=12):
         '''
-        Scrape fantasymath API
 
         Args:
+            path(str): sqlite file
+            expire_hours(float): time to live of cached responses
 
         '''
-        RequestScraper.__init__(self, **kwargs)
-        self.headers.update({'origin': 'https://fantasymath.com',
-                             'authority': 'api.fantasymath.com',
-                             'referer': 'https://fantasymath.com/'})
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.path = path
+        self.expire_hours = expire_hours
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS batches
+                           (key TEXT PRIMARY KEY, content TEXT, created REAL)''')
+            con.execute('''CREATE TABLE IF NOT EXISTS players
+                           (code TEXT, params TEXT, content TEXT, created REAL,
+                            PRIMARY KEY (code, params))''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @property
+    def _oldest(self):
+        return time.time() - self.expire_hours * 3600
+
+    @staticmethod
+    def params_key(params):
+        '''
+        Cache key for scoring params
+
+        Args:
+            params(iterable): of [key, value]
+
+        Returns:
+            str
 
-    def distribution(self, player_codes):
         '''
-        Gets projection distribution for specified players
+        return json.dumps(sorted(list(p) for p in params))
+
+    def batch_key(self, player_codes, params):
+        return json.dumps([sorted(set(player_codes)), self.params_key(params)])
+
+    def get_batch(self, player_codes, params):
+        '''
+        Gets cached response for exactly these players
+        Players are rebuilt in the order requested, which may differ from the cached request
 
         Args:
             player_codes(list): of str
+            params(iterable): of [key, value]
 
         Returns:
-            dict
+            dict: parsed json, None if not cached
+
+        '''
+        player_codes = list(player_codes)
+        with self._connect() as con:
+            row = con.execute('SELECT content FROM batches WHERE key = ? AND created > ?',
+                              (self.batch_key(player_codes, params), self._oldest)).fetchone()
+        if not row:
+            return None
+        players = self.get_players(player_codes, params)
+        if any(code not in players for code in player_codes):
+            return None
+        return dict(json.loads(row[0]), players=[players[code] for code in player_codes])
+
+    def get_players(self, player_codes, params):
+        '''
+        Gets cached distributions for individual players
+
+        Args:
+            player_codes(list): of str
+            params(iterable): of [key, value]
+
+        Returns:
+            dict: player_code: dict, only players that are cached
+
+        '''
+        player_codes = list(player_codes)
+        players = {}
+        pkey = self.params_key(params)
+        with self._connect() as con:
+            for i in range(0, len(player_codes), 500):
+                codes = player_codes[i:i + 500]
+                q = '''SELECT code, content FROM players
+                       WHERE params = ? AND created > ? AND code IN ({})'''
+                q = q.format(', '.join('?' * len(codes)))
+                for code, content in con.execute(q, [pkey, self._oldest] + codes):
+                    players[code] = json.loads(content)
+        return players
+
+    def set(self, player_codes, params, content):
+        '''
+        Caches response and each player in it
+
+        Args:
+            player_codes(list): of str, in order requested
+            params(iterable): of [key, value]
+            content(dict): parsed json
+
+        Returns:
+            None
+
+        '''
+        now = time.time()
+        pkey = self.params_key(params)
+        players = content.get('players', [])
+        with self._connect() as con:
+            con.execute('INSERT OR REPLACE INTO batches VALUES (?, ?, ?)',
+                        (self.batch_key(player_codes, params), json.dumps(content), now))
+            # api returns players in the order requested
+            if len(players) == len(player_codes):
+                con.executemany('INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?)',
+                                [(code, pkey, json.dumps(p), now)
+                                 for code, p in zip(player_codes, players)])
+            else:
+                logging.warning('could not split response for %s', player_codes)
+
+
+class PlayerState():
+    '''
+    Persists last players list and distribution fingerprints between runs
+    so a refresh only requests players that are new, returned or stale
+
+    '''
+
+    def __init__(self, players=None, removed=None, fingerprints=None, distributions=None):
+        '''
+
+        Args:
+            players(dict): last Parser.players result
+            removed(dict): player_code: unix time player left the list
+            fingerprints(dict): player_code: {'hash': str, 'fetched': float}
+            distributions(dict): player_code: dict
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.players = players or {}
+        self.removed = removed or {}
+        self.fingerprints = fingerprints or {}
+        self.distributions = distributions or {}
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Reads state from json file, empty state if no file
+
+        Args:
+            path(str):
+
+        Returns:
+            PlayerState
+
+        '''
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(**json.load(f))
 
+    def save(self, path):
         '''
+        Writes state to json file
+
+        Args:
+            path(str):
+
+        Returns:
+            None
+
+        '''
+        tmp = '{}.tmp'.format(path)
+        with open(tmp, 'w') as f:
+            json.dump({'players': self.players, 'removed': self.removed,
+                       'fingerprints': self.fingerprints,
+                       'distributions': self.distributions}, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def fingerprint(dist):
+        return hashlib.sha1(json.dumps(dist, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def diff(self, players, max_age_hours=24):
+        '''
+        Compares current players list with previous one
+
+        Args:
+            players(dict): Parser.players result
+            max_age_hours(float): distributions older than this are stale
+
+        Returns:
+            dict: of list - new, returned, changed, stale, removed
+
+        '''
+        oldest = time.time() - max_age_hours * 3600
+        diff = {'new': [], 'returned': [], 'changed': [], 'stale': [],
+                'removed': [code for code in self.players if code not in players]}
+        for code, player in players.items():
+            if code in self.removed:
+                diff['returned'].append(code)
+            elif code not in self.players:
+                diff['new'].append(code)
+            elif self.players[code] != player:
+                diff['changed'].append(code)
+            elif self.fingerprints.get(code, {}).get('fetched', 0) < oldest:
+                diff['stale'].append(code)
+        return diff
+
+    def update(self, players, dists):
+        '''
+        Records current players list and newly fetched distributions
+
+        Args:
+            players(dict): Parser.players result
+            dists(dict): player_code: dict
+
+        Returns:
+            list: of player_code whose distribution changed
+
+        '''
+        now = time.time()
+        for code in self.players:
+            if code not in players:
+                self.removed[code] = now
+        for code in players:
+            self.removed.pop(code, None)
+        self.players = players
+
+        changed = []
+        for code, dist in dists.items():
+            fp = self.fingerprint(dist)
+            if self.fingerprints.get(code, {}).get('hash') != fp:
+                changed.append(code)
+            self.fingerprints[code] = {'hash': fp, 'fetched': now}
+            self.distributions[code] = dist
+        return changed
+
+
+class Scraper(RequestScraper):
+    '''
+
+    '''
+
+    def __init__(self, max_players=3, dist_cache=None, **kwargs):
+        '''
+        Scrape fantasymath API
+
+        Args:
+            max_players(int): most wdis codes api accepts in one call
+            dist_cache(DistributionCache): default None
+
+        '''
+        RequestScraper.__init__(self, **kwargs)
+        self.max_players = max_players
+        self.dist_cache = dist_cache
+        self.headers.update({'origin': 'https://fantasymath.com',
+                             'authority': 'api.fantasymath.com',
+                             'referer': 'https://fantasymath.com/'})
+
+    @staticmethod
+    def scoring_params(dst='mfl', qb='pass4', scoring='ppr'):
+        return (['dst', dst], ['qb', qb], ['scoring', scoring])
+
+    def _distribution(self, player_codes, params):
         # api uses multiple parameters with same key (wdis)
         # get_json method sorts params for caching consistency
         # need to use tuple of lists so not overwrite wdis param
-        player_codes = list(player_codes)
         url = 'https://api.fantasymath.com/v2/players-wdis/'
         wdis = tuple(['wdis', player_code] for player_code in player_codes)
-        params = (['dst', 'mfl'], ['qb', 'pass4'], ['scoring', 'ppr'])
         resp = self.session.get(url, params=wdis + params)
         self.urls.append(resp.url)
         resp.raise_for_status()
@@ -53,6 +301,47 @@ class Scraper(RequestScraper):
             time.sleep(self.delay)
         return resp.json()
 
+    def distribution(self, player_codes, dst='mfl', qb='pass4', scoring='ppr',
+                     use_cache=True):
+        '''
+        Gets projection distribution for specified players
+        If dist_cache is set, only players not in cache are requested
+
+        Args:
+            player_codes(list): of str
+            dst(str): default 'mfl'
+            qb(str): default 'pass4'
+            scoring(str): default 'ppr'
+            use_cache(bool): False always requests players, response still updates cache
+
+        Returns:
+            dict
+
+        '''
+        player_codes = list(player_codes)
+        params = self.scoring_params(dst, qb, scoring)
+        if not self.dist_cache:
+            return self._distribution(player_codes, params)
+        if not use_cache:
+            content = self._distribution(player_codes, params)
+            self.dist_cache.set(player_codes, params, content)
+            return content
+
+        content = self.dist_cache.get_batch(player_codes, params)
+        if content:
+            return content
+        cached = self.dist_cache.get_players(player_codes, params)
+        missing = [code for code in player_codes if code not in cached]
+        if not missing:
+            return {'players': [cached[code] for code in player_codes]}
+        content = self._distribution(missing, params)
+        self.dist_cache.set(missing, params, content)
+        if not cached:
+            return content
+        fetched = dict(zip(missing, content.get('players', [])))
+        players = [cached.get(code) or fetched.get(code) for code in player_codes]
+        return dict(content, players=[p for p in players if p])
+
     def players(self):
         '''
         Gets projection distribution for specified players
@@ -133,45 +422,129 @@ class Agent():
     '''
     '''
 
-    def __init__(self, cache_name='fantasymath-agent'):
+    def __init__(self, cache_name='fantasymath-agent', expire_hours=12):
         logging.getLogger(__name__).addHandler(logging.NullHandler())
-        self._s = Scraper(cache_name=cache_name, delay=1.5)
+        dist_cache = DistributionCache('{}-distributions.sqlite'.format(cache_name),
+                                       expire_hours=expire_hours)
+        self._s = Scraper(cache_name=cache_name, dist_cache=dist_cache)
         self._p = Parser()
 
-    def weekly_projections(self):
+    @staticmethod
+    def batches(player_codes, size):
         '''
-        Gets weekly projections
+        Packs unique player codes into batches of size
 
         Args:
-            None
+            player_codes(iterable): of str
+            size(int): codes per batch
 
         Returns:
-            dict
+            list: of list
+
+        '''
+        codes = list(dict.fromkeys(player_codes))
+        return [codes[i:i + size] for i in range(0, len(codes), size)]
+
+    def _distribution(self, ids, bucket, use_cache=True):
+        '''
+        Gets and parses one batch in a worker thread
+
+        Args:
+            ids(list): of str
+            bucket(TokenBucket):
+            use_cache(bool): False skips dist_cache lookup
+
+        Returns:
+            dict: player_code: dict
+
+        '''
+        bucket.acquire()
+        dists = self._p.distribution(self._s.distribution(ids, use_cache=use_cache))
+        if len(dists) != len(ids):
+            raise ValueError('expected {} players, got {}'.format(len(ids), len(dists)))
+        # api returns players in the order requested
+        return dict(zip(ids, dists))
+
+    def distributions(self, player_codes, rate=1.0, max_workers=4, refetch=None):
+        '''
+        Gets distributions, fetching each player once in full-size batches
+
+        Args:
+            player_codes(iterable): of str
+            rate(float): api calls per second
+            max_workers(int): number of threads
+            refetch(iterable): of str, players requested even if in dist_cache
+
+        Returns:
+            dict: player_code: dict
 
         '''
         dists = {}
+        refetch = set(refetch or ())
+        player_codes = [code for code in player_codes if code not in refetch]
+        if self._s.dist_cache:
+            cached = self._s.dist_cache.get_players(player_codes, self._s.scoring_params())
+            if cached:
+                content = {'players': [cached[code] for code in cached]}
+                dists.update(zip(cached, self._p.distribution(content)))
+                player_codes = [code for code in player_codes if code not in cached]
+        bucket = TokenBucket(rate)
+        batches = [(ids, True) for ids in self.batches(player_codes, self._s.max_players)]
+        batches += [(ids, False) for ids in self.batches(sorted(refetch), self._s.max_players)]
+        logging.info('getting %s batches', len(batches))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._distribution, ids, bucket, use_cache): ids
+                       for ids, use_cache in batches}
+            for future in as_completed(futures):
+                try:
+                    dists.update(future.result())
+                except Exception:
+                    logging.exception('could not get %s', ', '.join(futures[future]))
+        return dists
+
+    def weekly_projections(self, rate=1.0, max_workers=4):
+        '''
+        Gets weekly projections
+
+        Args:
+            rate(float): api calls per second
+            max_workers(int): number of threads
+
+        Returns:
+            dict: player_code: dict
+
+        '''
         content = self._s.players()
         players = self._p.players(content)
+        return self.distributions(players, rate=rate, max_workers=max_workers)
 
-        for i in range(0, len(players), 3):
-            try:
-                ids = [players[i]['id'], players[i+1]['id'], players[i+2]['id']]
-            except IndexError:
-                try:
-                    ids = [players[i]['id'], players[i+1]['id']]
-                except:
-                    ids = [players[i]['id']]
-            idstr = ', '.join(ids)
-            logging.info('getting %s', idstr)
-            if idstr in dists:
-                logging.info('skipping %s', idstr)
-                continue
-            try:
-                content = self._s.distribution(ids)
-                dists[idstr] = self._p.distributions(content)
-            except:
-                logging.exception('could not get %s', idstr)
-        return dists
+    def refresh_projections(self, state_path, max_age_hours=24, rate=1.0, max_workers=4):
+        '''
+        Gets weekly projections, only requesting players that are new,
+        returned to the players list, relabeled or older than max_age_hours
+
+        Args:
+            state_path(str): json file with state of previous refresh
+            max_age_hours(float): refetch distributions older than this
+            rate(float): api calls per second
+            max_workers(int): number of threads
+
+        Returns:
+            dict: player_code: dict
+
+        '''
+        state = PlayerState.load(state_path)
+        players = self._p.players(self._s.players())
+        diff = state.diff(players, max_age_hours)
+        logging.info(', '.join('{} {}'.format(len(v), k) for k, v in diff.items()))
+        todo = diff['new'] + diff['returned'] + diff['changed'] + diff['stale']
+        # update stamps these as fetched now, so none can be served from dist_cache
+        dists = self.distributions(todo, rate=rate, max_workers=max_workers, refetch=todo)
+        changed = state.update(players, dists)
+        logging.info('%s distributions changed', len(changed))
+        state.save(state_path)
+        return {code: state.distributions[code] for code in players
+                if code in state.distributions}
 
 
 if __name__ == '__main__':
@@ -4,10 +4,87 @@
 
 '''
 
+import asyncio
+import codecs
+import hashlib
+import itertools
+import json
 import logging
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 
 from sportscraper.scraper import RequestScraper
 
+from nflfantasy.ratelimit import TokenBucket
+
+
+BASE_URL = 'http://www03.myfantasyleague.com/{}/export?'
+
+
+def iter_json_array(chunks, key):
+    '''
+    Yields objects of every array (or single object) stored under key
+    as json text arrives, only holding the object being decoded in memory
+
+    Args:
+        chunks(iterable): of str
+        key(str): 'player', 'draftPick', etc.
+
+    Returns:
+        generator: of dict
+
+    '''
+    decoder = json.JSONDecoder()
+    pattern = re.compile(r'"{}"\s*:\s*([\[{{])'.format(re.escape(key)))
+    buf = ''
+    pos = 0
+    state = 'search'
+    for chunk in itertools.chain(chunks, [None]):
+        done = chunk is None
+        if not done:
+            buf = buf[pos:] + chunk
+            pos = 0
+        while True:
+            if state == 'search':
+                match = pattern.search(buf, pos)
+                if not match:
+                    # keep tail in case key is split across chunks
+                    pos = max(pos, len(buf) - len(key) - 32)
+                    break
+                if match.group(1) == '{':
+                    state = 'object'
+                    pos = match.start(1)
+                else:
+                    state = 'array'
+                    pos = match.end()
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if state == 'array' and buf[pos] == ']':
+                state = 'search'
+                pos += 1
+                continue
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if done:
+                    raise
+                break
+            if state == 'object':
+                state = 'search'
+            yield obj
+        if done:
+            return
+
 
 class Scraper(RequestScraper):
     '''
@@ -31,7 +108,7 @@ class Scraper(RequestScraper):
 
     @property
     def base_url(self):
-        return 'http://www03.myfantasyleague.com/{}/export?'
+        return BASE_URL
 
 
     def adp(self, season_year, franchises=12, ppr=1):
@@ -116,6 +193,63 @@ class Scraper(RequestScraper):
         }
         return self.get_json(url, params=params)
 
+    def _iter_export(self, url, params, key, chunk_size=65536):
+        '''
+        Streams export and yields objects under key as they download
+
+        Args:
+            url(str):
+            params(dict):
+            key(str): 'player', 'draftPick', etc.
+            chunk_size(int): bytes per read
+
+        Returns:
+            generator: of dict
+
+        '''
+        resp = self.session.get(url, params=params, stream=True)
+        self.urls.append(resp.url)
+        try:
+            resp.raise_for_status()
+            decoder = codecs.getincrementaldecoder(resp.encoding or 'utf-8')()
+            chunks = (decoder.decode(chunk) for chunk in resp.iter_content(chunk_size))
+            yield from iter_json_array(chunks, key)
+        finally:
+            resp.close()
+
+    def iter_draft_picks(self, season_year, league_id):
+        '''
+        Streams draft results, yielding one pick at a time
+
+        Args:
+            season_year(2018): calendar year of season start
+            league_id(int): mfl-supplied numeric id of league
+
+        Returns:
+            generator: of dict
+
+        '''
+        url = self.base_url.format(season_year)
+        params = {'TYPE': 'draftResults', 'L': league_id, 'JSON': 1}
+        return self._iter_export(url, params, 'draftPick')
+
+    def iter_players(self, season_year, since=None, details=1):
+        '''
+        Streams players, yielding one player at a time
+
+        Args:
+            season_year(int): 2018, etc.
+            since(int): unix timestamp
+            details(int): 1 for details, 0 if not
+
+        Returns:
+            generator: of dict
+
+        '''
+        url = self.base_url.format(season_year)
+        params = {'TYPE': 'players', 'SINCE': since, 'DETAILS': details, 'JSON': 1}
+        return self._iter_export(url, params, 'player')
+
 
 class Parser():
     '''
@@ -142,6 +276,39 @@ class Parser():
         '''
         return content['adp']['player']
 
+    def adp_panel(self, results):
+        '''
+        Combines adp responses for several configurations into one table
+
+        Args:
+            results(dict): key is (franchises, ppr), value is parsed json
+
+        Returns:
+            DataFrame: indexed by player id, franchises, ppr
+
+        '''
+        columns = {'id': 'player_id', 'rank': 'rank', 'averagePick': 'adp',
+                   'minPick': 'min_pick', 'maxPick': 'max_pick',
+                   'draftSelPct': 'draft_pct', 'draftsSelectedIn': 'drafts_selected_in'}
+        frames = []
+        for (franchises, ppr), content in results.items():
+            players = self.adp(content)
+            if isinstance(players, dict):
+                players = [players]
+            df = pd.DataFrame(players)
+            df = df[[c for c in columns if c in df.columns]].rename(columns=columns)
+            df['franchises'] = franchises
+            df['ppr'] = ppr
+            df['total_drafts'] = content['adp'].get('totalDrafts')
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        for c in df.columns:
+            if c != 'player_id':
+                df[c] = pd.to_numeric(df[c], errors='coerce')
+        return df.set_index(['player_id', 'franchises', 'ppr']).sort_index()
+
     def draft_results(self, content):
         '''
         Parses response and returns list of draft picks
@@ -155,6 +322,37 @@ class Parser():
         '''
         return content['draftResults']
 
+    def draft_picks(self, content, league_id=None, made_only=True):
+        '''
+        Flattens draft results into list of picks
+        Each pick gets its draft unit, round and pick repeat across units
+
+        Args:
+            content (dict): parsed json
+            league_id(int): added to each pick if given
+            made_only(bool): skip picks that have not been made
+
+        Returns:
+            list: of dict
+
+        '''
+        picks = []
+        units = content.get('draftResults', {}).get('draftUnit', [])
+        if isinstance(units, dict):
+            units = [units]
+        for unit in units:
+            unit_picks = unit.get('draftPick', [])
+            if isinstance(unit_picks, dict):
+                unit_picks = [unit_picks]
+            for pick in unit_picks:
+                if made_only and not pick.get('player'):
+                    continue
+                pick = dict(pick, unit=unit.get('unit'))
+                if league_id is not None:
+                    pick = dict(pick, league_id=league_id)
+                picks.append(pick)
+        return picks
+
     def league(self, content):
         '''
         Parses response and returns list of teams in league
@@ -179,7 +377,11 @@ class Parser():
             List of dictionaries if successful, empty list otherwise.
 
         '''
-        return content['players']['player']
+        players = content.get('players', {}).get('player', [])
+        # api returns dict rather than list when there is one player
+        if isinstance(players, dict):
+            return [players]
+        return players
 
 
 class Agent():
@@ -201,6 +403,38 @@ class Agent():
         content = self._s.adp(self.season_year, franchises, ppr)
         return self._p.adp(content)
 
+    def adp_sweep(self, franchises=(8, 10, 12, 14, 16), ppr=(-1, 0, 1), max_workers=None):
+        '''
+        Gets adp for every franchises x ppr configuration concurrently
+
+        Args:
+            franchises(iterable): of int, number of teams
+            ppr(iterable): of int, 1 ppr, 0 std, -1 both
+            max_workers(int): default one thread per configuration
+
+        Returns:
+            DataFrame: indexed by player id, franchises, ppr
+
+        '''
+        configs = list(itertools.product(franchises, ppr))
+        max_workers = max_workers or len(configs)
+
+        # size connection pool so threads reuse connections to mfl
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._s.session.mount('http://', adapter)
+        self._s.session.mount('https://', adapter)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._s.adp, self.season_year, f, p): (f, p)
+                       for f, p in configs}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception:
+                    logging.exception('could not get adp %s', futures[future])
+        return self._p.adp_panel(results)
+
     def players(self, since=None, details=1):
         '''
 
@@ -210,6 +444,615 @@ class Agent():
         content = self._s.players(self.season_year, since, details)
         return self._p.players(content)
 
+    def player_master(self, path):
+        '''
+        Syncs local player master
+
+        Args:
+            path(str): sqlite file
+
+        Returns:
+            PlayerMaster
+
+        '''
+        master = PlayerMaster(path, self.season_year)
+        master.sync(self._s)
+        return master
+
+    def player_registry(self, since=None, details=1):
+        '''
+        Gets players as indexed registry
+
+        Returns:
+            PlayerRegistry
+
+        '''
+        return PlayerRegistry(self.players(since, details))
+
+
+class PlayerMaster():
+    '''
+    Local sqlite copy of mfl players for one season
+    First sync is a full load, later syncs apply SINCE deltas
+    Uses WAL journal so other processes can read during sync
+
+    '''
+
+    def __init__(self, path, season_year):
+        '''
+
+        Args:
+            path(str): sqlite file
+            season_year(int): 2018, etc.
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.path = path
+        self.season_year = season_year
+        with self._connect() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('''CREATE TABLE IF NOT EXISTS players
+                           (id TEXT PRIMARY KEY, name TEXT, position TEXT,
+                            team TEXT, data TEXT)''')
+            con.execute('''CREATE TABLE IF NOT EXISTS meta
+                           (key TEXT PRIMARY KEY, value TEXT)''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute('SELECT count(*) FROM players').fetchone()[0]
+
+    @property
+    def watermark(self):
+        '''
+        Unix time of last sync, None if never synced
+
+        Returns:
+            int
+
+        '''
+        with self._connect() as con:
+            row = con.execute('SELECT value FROM meta WHERE key = ?',
+                              ('since_{}'.format(self.season_year),)).fetchone()
+        if row:
+            return int(row[0])
+        return None
+
+    def sync(self, scraper, details=1):
+        '''
+        Applies players changed since watermark, full load if no watermark
+
+        Args:
+            scraper(Scraper): mfl scraper
+            details(int): 1 for details, 0 if not
+
+        Returns:
+            int: number of players added or updated
+
+        '''
+        since = self.watermark
+        started = int(time.time())
+        content = scraper.players(self.season_year, since=since, details=details)
+        players = Parser().players(content)
+        rows = [(p['id'], p.get('name'), p.get('position'), p.get('team'), json.dumps(p))
+                for p in players]
+        con = self._connect()
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            con.executemany('INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?)', rows)
+            con.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                        ('since_{}'.format(self.season_year), str(started)))
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+        logging.info('synced %s players since %s', len(rows), since)
+        return len(rows)
+
+    def get(self, player_id):
+        '''
+        Gets one player
+
+        Args:
+            player_id(str): mfl player id
+
+        Returns:
+            dict: None if not found
+
+        '''
+        with self._connect() as con:
+            row = con.execute('SELECT data FROM players WHERE id = ?',
+                              (str(player_id),)).fetchone()
+        if row:
+            return json.loads(row[0])
+        return None
+
+    def players(self, position=None, team=None):
+        '''
+        Gets players, optionally filtered
+
+        Args:
+            position(str): 'QB', etc.
+            team(str): 'ARI', etc.
+
+        Returns:
+            list: of dict
+
+        '''
+        q = 'SELECT data FROM players WHERE 1 = 1'
+        params = []
+        if position:
+            q += ' AND position = ?'
+            params.append(position)
+        if team:
+            q += ' AND team = ?'
+            params.append(team)
+        with self._connect() as con:
+            return [json.loads(row[0]) for row in con.execute(q, params)]
+
+
+class Player():
+    '''
+    Compact mfl player record
+
+    '''
+
+    __slots__ = ('id', 'name', 'position', 'team')
+
+    def __init__(self, id, name, position=None, team=None):
+        self.id = id
+        self.name = name
+        self.position = position
+        self.team = team
+
+    def __repr__(self):
+        return 'Player({!r}, {!r}, {!r}, {!r})'.format(self.id, self.name,
+                                                       self.position, self.team)
+
+    def __eq__(self, other):
+        return isinstance(other, Player) and \
+            all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class PlayerRegistry():
+    '''
+    In-memory mfl players indexed by id, normalized name, position and team
+
+    '''
+
+    suffixes = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+    def __init__(self, players=()):
+        '''
+
+        Args:
+            players(iterable): of dict from Parser.players or PlayerMaster.players
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self._players = {}
+        self._names = defaultdict(list)
+        self._positions = defaultdict(list)
+        self._teams = defaultdict(list)
+        for p in players:
+            self.add(p)
+
+    def __len__(self):
+        return len(self._players)
+
+    def __iter__(self):
+        return iter(self._players.values())
+
+    def __contains__(self, player_id):
+        return str(player_id) in self._players
+
+    @classmethod
+    def normalize_name(cls, name):
+        '''
+        Converts 'Last, First' or 'First Last' to lowercase 'first last'
+        without punctuation or suffixes
+
+        Args:
+            name(str):
+
+        Returns:
+            str
+
+        '''
+        if ', ' in name:
+            last, first = name.split(', ', 1)
+            name = '{} {}'.format(first, last)
+        words = re.sub(r"[^a-z0-9 ]", '', name.lower().replace('-', ' ')).split()
+        return ' '.join(w for w in words if w not in cls.suffixes)
+
+    def _unindex(self, player):
+        self._names[self.normalize_name(player.name)].remove(player.id)
+        self._positions[player.position].remove(player.id)
+        self._teams[player.team].remove(player.id)
+
+    def add(self, player):
+        '''
+        Adds or replaces player
+
+        Args:
+            player(dict): mfl player with id, name, position, team
+
+        Returns:
+            Player
+
+        '''
+        pid = sys.intern(str(player['id']))
+        if pid in self._players:
+            self._unindex(self._players[pid])
+        position = player.get('position')
+        team = player.get('team')
+        rec = Player(pid, player['name'],
+                     sys.intern(position) if position else position,
+                     sys.intern(team) if team else team)
+        self._players[pid] = rec
+        self._names[self.normalize_name(rec.name)].append(pid)
+        self._positions[rec.position].append(pid)
+        self._teams[rec.team].append(pid)
+        return rec
+
+    def get(self, player_id):
+        '''
+        Gets player by mfl id
+
+        Args:
+            player_id(str):
+
+        Returns:
+            Player: None if not found
+
+        '''
+        return self._players.get(str(player_id))
+
+    def by_name(self, name, position=None):
+        '''
+        Gets players by name in any format
+
+        Args:
+            name(str): 'Brady, Tom', 'Tom Brady', etc.
+            position(str): 'QB', etc.
+
+        Returns:
+            list: of Player
+
+        '''
+        players = [self._players[pid] for pid in self._names.get(self.normalize_name(name), [])]
+        if position:
+            return [p for p in players if p.position == position]
+        return players
+
+    def by_position(self, position):
+        return [self._players[pid] for pid in self._positions.get(position, [])]
+
+    def by_team(self, team):
+        return [self._players[pid] for pid in self._teams.get(team, [])]
+
+
+class DraftTracker():
+    '''
+    Polls a live mfl draft and sends each new pick to subscribers
+    Polls every min_interval while picks are coming in, backs off when paused
+    Unchanged responses are detected by hash and not parsed
+
+    '''
+
+    def __init__(self, season_year, league_id, min_interval=1.0, max_interval=30.0,
+                 backoff=1.5, session=None):
+        '''
+
+        Args:
+            season_year(int): 2018, etc.
+            league_id(int): mfl-supplied numeric id of league
+            min_interval(float): seconds between polls while draft is active
+            max_interval(float): longest wait between polls
+            backoff(float): interval multiplier after poll without picks
+            session(Session): default uncached requests session
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.season_year = season_year
+        self.league_id = league_id
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.session = session or requests.Session()
+        self.complete = False
+        self._p = Parser()
+        self._seen = set()
+        self._subscribers = []
+        self._digest = None
+        self._headers = {}
+
+    def subscribe(self, callback):
+        '''
+        Registers function called with each new pick
+
+        Args:
+            callback(callable): takes pick dict
+
+        Returns:
+            callable
+
+        '''
+        self._subscribers.append(callback)
+        return callback
+
+    def _fetch(self):
+        '''
+        Gets draft results if changed since last poll
+
+        Returns:
+            dict: parsed json, None if unchanged
+
+        '''
+        params = {'TYPE': 'draftResults', 'L': self.league_id, 'JSON': 1}
+        resp = self.session.get(BASE_URL.format(self.season_year), params=params,
+                                headers=self._headers, timeout=10)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+        self._headers = {}
+        if resp.headers.get('ETag'):
+            self._headers['If-None-Match'] = resp.headers['ETag']
+        if resp.headers.get('Last-Modified'):
+            self._headers['If-Modified-Since'] = resp.headers['Last-Modified']
+        digest = hashlib.sha1(resp.content).digest()
+        if digest == self._digest:
+            return None
+        self._digest = digest
+        return json.loads(resp.content)
+
+    def poll(self):
+        '''
+        Polls once, notifies subscribers of new picks and adjusts interval
+
+        Returns:
+            list: of new pick dict
+
+        '''
+        new = []
+        content = self._fetch()
+        if content is not None:
+            picks = self._p.draft_picks(content, self.league_id, made_only=False)
+            for pick in picks:
+                key = (pick.get('unit'), pick.get('round'), pick.get('pick'))
+                if pick.get('player') and key not in self._seen:
+                    self._seen.add(key)
+                    new.append(pick)
+            # complete when every pick of every unit is made
+            self.complete = bool(picks) and all(pick.get('player') for pick in picks)
+        for pick in new:
+            for callback in self._subscribers:
+                try:
+                    callback(pick)
+                except Exception:
+                    logging.exception('subscriber failed on %s', pick)
+        if new:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return new
+
+    def run(self, stop=None, max_polls=None):
+        '''
+        Polls until draft is complete, stop is set or max_polls reached
+
+        Args:
+            stop(threading.Event): set from another thread to stop
+            max_polls(int): default no limit
+
+        Returns:
+            int: number of picks seen
+
+        '''
+        polls = 0
+        while not self.complete and not (stop and stop.is_set()):
+            try:
+                self.poll()
+            except Exception:
+                logging.exception('could not poll league %s', self.league_id)
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+            polls += 1
+            if max_polls and polls >= max_polls:
+                break
+            if stop:
+                stop.wait(self.interval)
+            else:
+                time.sleep(self.interval)
+        return len(self._seen)
+
+
+class JsonLinesSink():
+    '''
+    Append-only json-lines file of draft picks, one line per pick
+    Each league ends with a marker line {"league_id": ..., "done": true, "picks": n},
+    so leagues without picks are also recorded
+
+    '''
+
+    def __init__(self, path):
+        '''
+
+        Args:
+            path(str): json-lines file
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.path = path
+
+    def leagues(self):
+        '''
+        League ids finished in file, a league cut off before its marker is not included
+
+        Returns:
+            set
+
+        '''
+        leagues = set()
+        for d in self._lines():
+            if d.get('done'):
+                leagues.add(d.get('league_id'))
+        return leagues
+
+    def _lines(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            pass
+
+    def picks(self):
+        '''
+        Picks in file, without marker lines
+
+        Returns:
+            generator: of dict
+
+        '''
+        return (d for d in self._lines() if not d.get('done'))
+
+    def write(self, league_id, picks):
+        '''
+        Appends picks of one league followed by its marker line
+
+        Args:
+            league_id(int):
+            picks(list): of dict
+
+        Returns:
+            None
+
+        '''
+        with open(self.path, 'a') as f:
+            for pick in picks:
+                f.write(json.dumps(pick) + '\n')
+            f.write(json.dumps({'league_id': league_id, 'done': True,
+                                'picks': len(picks)}) + '\n')
+
+
+class DraftHarvester():
+    '''
+    Gets draft results for a stream of leagues with asyncio
+    Concurrency is bounded by number of workers, requests by token bucket
+
+    '''
+
+    def __init__(self, season_year, scraper=None, concurrency=8, rate=5.0,
+                 retries=3, backoff=1.0):
+        '''
+
+        Args:
+            season_year(int): 2018, etc.
+            scraper(Scraper): default new Scraper
+            concurrency(int): leagues in flight at once
+            rate(float): requests per second
+            retries(int): attempts after first failure
+            backoff(float): seconds before first retry, doubles each retry
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.season_year = season_year
+        self._s = scraper or Scraper()
+        self._p = Parser()
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, capacity=concurrency)
+        self.retries = retries
+        self.backoff = backoff
+
+    async def _fetch(self, league_id):
+        '''
+        Gets and parses picks of one league, retrying on errors
+        An mfl error document (private or missing league) is not retried
+
+        Args:
+            league_id(int):
+
+        Returns:
+            list: of dict
+
+        '''
+        for attempt in range(self.retries + 1):
+            await asyncio.sleep(self.bucket.reserve())
+            try:
+                content = await asyncio.to_thread(self._s.draft_results,
+                                                  self.season_year, league_id)
+                if 'error' in content:
+                    logging.warning('league %s: %s', league_id, content['error'])
+                return self._p.draft_picks(content, league_id)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                logging.warning('retrying league %s', league_id)
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _worker(self, league_ids, sink, stats):
+        # league_ids is shared iterator, so each league goes to one worker
+        for league_id in league_ids:
+            try:
+                picks = await self._fetch(league_id)
+            except Exception:
+                logging.exception('could not get league %s', league_id)
+                stats['failed'] += 1
+                continue
+            sink.write(league_id, picks)
+            stats['leagues'] += 1
+            stats['picks'] += len(picks)
+            if not picks:
+                stats['empty'] += 1
+            if stats['leagues'] % 100 == 0:
+                logging.info('%s leagues, %s picks', stats['leagues'], stats['picks'])
+
+    async def harvest(self, league_ids, sink, skip_done=True):
+        '''
+        Gets draft picks for leagues and writes them to sink as they arrive
+
+        Args:
+            league_ids(iterable): of int, can be a generator
+            sink(JsonLinesSink): or object with write(league_id, picks)
+            skip_done(bool): skip leagues finished in sink, including empty leagues
+
+        Returns:
+            dict: counts of leagues, picks, empty, failed
+
+        '''
+        stats = {'leagues': 0, 'picks': 0, 'empty': 0, 'failed': 0}
+        if skip_done and hasattr(sink, 'leagues'):
+            done = sink.leagues()
+            league_ids = (league_id for league_id in league_ids if league_id not in done)
+        league_ids = iter(league_ids)
+        await asyncio.gather(*[self._worker(league_ids, sink, stats)
+                               for _ in range(self.concurrency)])
+        return stats
+
+    def run(self, league_ids, sink, skip_done=True):
+        '''
+        Runs harvest in new event loop
+
+        Args:
+            league_ids(iterable): of int
+            sink(JsonLinesSink):
+            skip_done(bool): skip leagues already in sink
+
+        Returns:
+            dict: counts of leagues, picks, empty, failed
+
+        '''
+        return asyncio.run(self.harvest(league_ids, sink, skip_done))
+
 
 if __name__ == '__main__':
     pass
@@ -5,11 +5,24 @@
 
 '''
 
+import bisect
 import logging
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
 
 from sportscraper.scraper import RequestScraper
 
 
+RankerRank = namedtuple('RankerRank', ['source_player_id', 'source_player_name',
+                                       'source_player_rank', 'source_ranker_id',
+                                       'source_ranker_name', 'source_player_position',
+                                       'season_year', 'source_ranking_type'])
+
+
 class Scraper(RequestScraper):
     '''
     Scraper for profootballfocus.com fantasy resources
@@ -83,10 +96,13 @@ class Parser():
         for key, value in pff_ranks.items():
             playerd = playerposd.get(key)
             if playerd:
+                # copy so shared playerposd is not changed
+                playerd = dict(playerd)
                 playerd['player_id'] = key
                 playerd['ranks'] = sorted(value)
+                # middle two of four ranks
                 if len(value) == 4:
-                    playerd['avg'] = round(sum(value[1:3]) / 2.0, 2)
+                    playerd['avg'] = round(sum(sorted(value)[1:3]) / 2.0, 2)
                 else:
                     playerd['avg'] = round(sum(value) / float(len(value)), 2)
             vals.append(playerd)
@@ -160,42 +176,82 @@ class Parser():
         playerposd = Parser._player_position_dict(playerd, posd)
         return Parser._overall_rankings(content, playerposd)
 
-        """
-        results = []
-
-        # teams
-        teams = content['teams']
-        teams_d = {t['franchise_id']: t for t in teams}
+    def bestball_rankings_long(self, content):
+        '''
+        Yields one record per player x ranker x position
+        Repeated strings (season, ranking type, ranker, position, name) are interned
 
-        # ranking_type
-        positions = content['ranking_type']['allowed_positions']
-        ranking_type = content['ranking_type']['path']
-        season = content['ranking_type']['season']
+        Args:
+            content(dict): parsed json
 
-        # rankers
-        rankers = content['rankers']
-        rankers_d = {r['id']: r for r in rankers}
+        Returns:
+            generator: of RankerRank
 
-        # players
-        players = content['players']
-        players_d = {p['player_id']: p for p in players}
+        '''
+        ranking_type = sys.intern(content['ranking_type']['path'])
+        season = content['ranking_type']['season']
+        rankers_d = {r['id']: sys.intern(r['name']) for r in content['rankers']}
+        players_d = {}
+        for p in content['players']:
+            name = self._name(p)
+            players_d[p['player_id']] = sys.intern(name) if name else name
 
-        # position_rankings
         for posrank in content['position_rankings']:
-            pos = posrank['position']
+            pos = sys.intern(posrank['position'])
             for prkg in posrank['player_rankings']:
                 pid = prkg['player_id']
                 for rnk in prkg['ranks']:
-                    results.append({'source_player_id': pid,
-                                    'source_player_name': self._name(players_d.get(pid)),
-                                    'source_player_rank': rnk['rank'],
-                                    'source_ranker_id': rnk['ranker_id'],
-                                    'source_ranker_name': rankers_d[rnk['ranker_id']]['name'],
-                                    'source_player_position': pos,
-                                    'season_year': season, 'source_ranking_type': ranking_type})
+                    yield RankerRank(pid, players_d.get(pid), rnk['rank'], rnk['ranker_id'],
+                                     rankers_d.get(rnk['ranker_id']), pos, season,
+                                     ranking_type)
 
-        return results
-        """
+    def bestball_rankings_frame(self, content):
+        '''
+        Long-form rankings as columnar DataFrame with categorical strings
+
+        Args:
+            content(dict): parsed json
+
+        Returns:
+            DataFrame
+
+        '''
+        cols = list(zip(*self.bestball_rankings_long(content)))
+        if not cols:
+            return pd.DataFrame(columns=RankerRank._fields)
+        df = pd.DataFrame(dict(zip(RankerRank._fields, cols)))
+        return df.astype({'source_player_name': 'category', 'source_ranker_name': 'category',
+                          'source_player_position': 'category',
+                          'source_ranking_type': 'category'})
+
+    def bestball_matrix(self, content):
+        '''
+        Parses pff bestball json document into players x rankers matrix
+
+        Args:
+            content(dict): parsed json
+
+        Returns:
+            RankingMatrix
+
+        '''
+        playerd = Parser._player_names(content)
+        posd = Parser._player_positions(content)
+        playerposd = Parser._player_position_dict(playerd, posd)
+        overall = [r for r in content.get('position_rankings') if
+                   r['position'] == 'overall'][0]['player_rankings']
+        player_ids = [r['player_id'] for r in overall]
+        ranker_ids = sorted({rk['ranker_id'] for r in overall for rk in r['ranks']})
+        col = {ranker_id: j for j, ranker_id in enumerate(ranker_ids)}
+        rows, cols, vals = [], [], []
+        for i, r in enumerate(overall):
+            for rk in r['ranks']:
+                rows.append(i)
+                cols.append(col[rk['ranker_id']])
+                vals.append(rk['rank'])
+        ranks = np.full((len(player_ids), len(ranker_ids)), np.nan)
+        ranks[rows, cols] = vals
+        return RankingMatrix(player_ids, ranker_ids, ranks, playerposd)
 
     def weekly_projections(self, content):
         '''
@@ -210,6 +266,461 @@ class Parser():
         '''
         return content['player_projections']
 
+    def projection_cube(self, weekly, stats=None, id_key='player_id'):
+        '''
+        Assembles weekly projections into players x weeks x stats cube
+        Missing player-weeks (byes, injuries) are nan
+
+        Args:
+            weekly(dict): week: list of dict from weekly_projections
+            stats(list): stat keys, default every numeric field
+            id_key(str): field identifying player
+
+        Returns:
+            ProjectionCube
+
+        '''
+        weeks = sorted(weekly)
+        players = {}
+        if stats is None:
+            stats = {}
+            for week in weeks:
+                for proj in weekly[week]:
+                    for k, v in proj.items():
+                        if k not in ProjectionCube.meta_keys and k != id_key and \
+                           isinstance(v, (int, float)) and not isinstance(v, bool):
+                            stats[k] = None
+        stats = list(stats)
+        for week in weeks:
+            for proj in weekly[week]:
+                if proj[id_key] not in players:
+                    players[proj[id_key]] = {k: v for k, v in proj.items()
+                                             if k in ProjectionCube.meta_keys}
+
+        pidx = {pid: i for i, pid in enumerate(players)}
+        values = np.full((len(players), len(weeks), len(stats)), np.nan)
+        for j, week in enumerate(weeks):
+            for proj in weekly[week]:
+                i = pidx[proj[id_key]]
+                values[i, j] = [proj.get(stat, np.nan) for stat in stats]
+        return ProjectionCube(list(players), weeks, stats, values, players)
+
+
+class ProjectionCube():
+    '''
+    Dense players x weeks x stats array of projections with labels
+    Season, rest-of-season and week-over-week views are array slices
+
+    '''
+
+    meta_keys = ('player_name', 'first_name', 'last_name', 'position', 'team_name',
+                 'team', 'opponent', 'week', 'season', 'game_id', 'bye')
+
+    def __init__(self, player_ids, weeks, stats, values, players=None):
+        '''
+
+        Args:
+            player_ids(list): axis 0 labels
+            weeks(list): axis 1 labels, ascending
+            stats(list): axis 2 labels
+            values(ndarray): players x weeks x stats
+            players(dict): player_id: dict of non-stat fields
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.player_ids = list(player_ids)
+        self.weeks = list(weeks)
+        self.stats = list(stats)
+        self.values = np.asarray(values, dtype=float)
+        self.players = players or {}
+        self.player_index = {pid: i for i, pid in enumerate(self.player_ids)}
+        self.stat_index = {stat: i for i, stat in enumerate(self.stats)}
+
+    def _stat_slice(self, stats):
+        if stats is None:
+            return slice(None), self.stats
+        if isinstance(stats, str):
+            stats = [stats]
+        return [self.stat_index[stat] for stat in stats], list(stats)
+
+    def _frame(self, arr, columns):
+        return pd.DataFrame(arr, index=pd.Index(self.player_ids, name='player_id'),
+                            columns=columns)
+
+    def stat(self, stat):
+        '''
+        One stat for every player and week
+
+        Args:
+            stat(str):
+
+        Returns:
+            DataFrame: players x weeks
+
+        '''
+        return self._frame(self.values[:, :, self.stat_index[stat]], self.weeks)
+
+    def totals(self, stats=None, start=None, end=None):
+        '''
+        Sums stats over range of weeks, missing weeks count as zero
+
+        Args:
+            stats(list): default all
+            start(int): first week, inclusive
+            end(int): last week, inclusive
+
+        Returns:
+            DataFrame: players x stats
+
+        '''
+        wks = np.asarray(self.weeks)
+        keep = np.ones(len(wks), dtype=bool)
+        if start is not None:
+            keep &= wks >= start
+        if end is not None:
+            keep &= wks <= end
+        idx, cols = self._stat_slice(stats)
+        return self._frame(np.nansum(self.values[:, keep][:, :, idx], axis=1), cols)
+
+    def season(self, stats=None):
+        return self.totals(stats)
+
+    def rest_of_season(self, week, stats=None):
+        '''
+        Sums stats from week through end of season
+
+        Args:
+            week(int): current week, inclusive
+            stats(list): default all
+
+        Returns:
+            DataFrame: players x stats
+
+        '''
+        return self.totals(stats, start=week)
+
+    def deltas(self, stat):
+        '''
+        Week-over-week change in one stat
+
+        Args:
+            stat(str):
+
+        Returns:
+            DataFrame: players x weeks[1:], nan where either week is missing
+
+        '''
+        arr = np.diff(self.values[:, :, self.stat_index[stat]], axis=1)
+        return self._frame(arr, self.weeks[1:])
+
+
+class RankingMatrix():
+    '''
+    Players x rankers matrix of ranks, nan where ranker did not rank player
+    Aggregates are vectorized, so board can be re-scored without re-parsing
+
+    '''
+
+    def __init__(self, player_ids, ranker_ids, ranks, players=None):
+        '''
+
+        Args:
+            player_ids(list): row labels
+            ranker_ids(list): column labels
+            ranks(ndarray): players x rankers
+            players(dict): player_id: {'plyr': name, 'pos': position}
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.player_ids = list(player_ids)
+        self.ranker_ids = list(ranker_ids)
+        self.ranks = np.asarray(ranks, dtype=float)
+        self.mask = ~np.isnan(self.ranks)
+        self.players = players or {}
+
+    def count(self):
+        return self.mask.sum(axis=1)
+
+    def mean(self):
+        n = self.count()
+        total = np.where(self.mask, self.ranks, 0).sum(axis=1)
+        return np.divide(total, n, out=np.full(len(n), np.nan), where=n > 0)
+
+    def std(self):
+        n = self.count()
+        dev = np.where(self.mask, self.ranks - self.mean()[:, None], 0)
+        var = np.divide((dev * dev).sum(axis=1), n, out=np.full(len(n), np.nan), where=n > 0)
+        return np.sqrt(var)
+
+    def median(self):
+        return self.trimmed_mean(trim=None)
+
+    def trimmed_mean(self, trim=1):
+        '''
+        Mean after dropping trim best and trim worst ranks of each player
+        Players with too few ranks to trim use the middle rank(s)
+
+        Args:
+            trim(int): ranks dropped from each end, None for median
+
+        Returns:
+            ndarray
+
+        '''
+        srt = np.sort(self.ranks, axis=1)
+        n = self.count()[:, None]
+        pos = np.arange(self.ranks.shape[1])[None, :]
+        if trim is None:
+            keep_lo, keep_hi = (n - 1) // 2, n // 2
+        else:
+            t = np.minimum(trim, (n - 1) // 2)
+            keep_lo, keep_hi = t, n - 1 - t
+        # np.sort puts nan last, so valid ranks are positions below n
+        keep = (pos >= keep_lo) & (pos <= keep_hi) & (pos < n)
+        total = np.where(keep, srt, 0).sum(axis=1)
+        kept = keep.sum(axis=1)
+        return np.divide(total, kept, out=np.full(len(kept), np.nan), where=kept > 0)
+
+    def pff_avg(self):
+        '''
+        Average used by bestball_rankings: middle two of four ranks, else mean
+
+        Returns:
+            ndarray
+
+        '''
+        return np.where(self.count() == 4, self.trimmed_mean(trim=1), self.mean())
+
+    def consensus(self, rule='pff_avg'):
+        '''
+        Scores every player with aggregation rule
+
+        Args:
+            rule(str): mean, median, trimmed_mean, pff_avg, or callable taking matrix
+
+        Returns:
+            ndarray
+
+        '''
+        if callable(rule):
+            return np.asarray(rule(self))
+        if rule not in ('mean', 'median', 'trimmed_mean', 'pff_avg'):
+            raise ValueError('invalid rule: {}'.format(rule))
+        return getattr(self, rule)()
+
+    def board(self, rule='pff_avg'):
+        '''
+        Players sorted by consensus
+
+        Args:
+            rule(str): see consensus
+
+        Returns:
+            list: of dict
+
+        '''
+        score = self.consensus(rule)
+        std = self.std()
+        srt = np.sort(self.ranks, axis=1)
+        n = self.count()
+        vals = []
+        for i in np.argsort(score, kind='stable'):
+            pid = self.player_ids[i]
+            playerd = dict(self.players.get(pid, {}))
+            ranks = [int(r) if r.is_integer() else r for r in srt[i, :n[i]].tolist()]
+            playerd.update({'player_id': pid, 'ranks': ranks,
+                            'avg': round(float(score[i]), 2),
+                            'std': round(float(std[i]), 2)})
+            vals.append(playerd)
+        return vals
+
+
+class ConsensusEngine():
+    '''
+    Keeps running per-player sums, counts and sorted ranks
+    so a refresh only touches the rankers whose columns changed
+    Changed columns are found by comparing arrays with the previous board
+
+    '''
+
+    rules = ('mean', 'median', 'trimmed_mean', 'pff_avg')
+
+    def __init__(self, rule='pff_avg', trim=1):
+        '''
+
+        Args:
+            rule(str): mean, median, trimmed_mean, pff_avg
+            trim(int): ranks dropped from each end for trimmed_mean
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        if rule not in self.rules:
+            raise ValueError('invalid rule: {}'.format(rule))
+        self.rule = rule
+        self.trim = trim
+        self.columns = {}
+        self.sums = {}
+        self.counts = {}
+        self.sorted_ranks = {}
+        self.consensus = {}
+        # previous board, None after apply until next refresh
+        self._ranks = None
+        self._player_ids = None
+        self._ranker_ids = None
+
+    def _add(self, pid, rank):
+        self.sums[pid] = self.sums.get(pid, 0) + rank
+        self.counts[pid] = self.counts.get(pid, 0) + 1
+        bisect.insort(self.sorted_ranks.setdefault(pid, []), rank)
+
+    def _remove(self, pid, rank):
+        self.sums[pid] -= rank
+        self.counts[pid] -= 1
+        ranks = self.sorted_ranks[pid]
+        del ranks[bisect.bisect_left(ranks, rank)]
+
+    def _score(self, pid):
+        '''
+        Consensus of one player from running stats, matches RankingMatrix rules
+
+        Returns:
+            float: None if player has no ranks
+
+        '''
+        n = self.counts.get(pid, 0)
+        if not n:
+            return None
+        ranks = self.sorted_ranks[pid]
+        if self.rule == 'mean' or (self.rule == 'pff_avg' and n != 4):
+            return self.sums[pid] / n
+        if self.rule == 'median':
+            lo, hi = (n - 1) // 2, n // 2
+        else:
+            t = min(1 if self.rule == 'pff_avg' else self.trim, (n - 1) // 2)
+            lo, hi = t, n - 1 - t
+        return sum(ranks[lo:hi + 1]) / (hi - lo + 1)
+
+    def apply(self, ranker_id, column):
+        '''
+        Replaces one ranker's ranks, touching only players that moved
+        Consensus of touched players is updated
+
+        Args:
+            ranker_id(int):
+            column(dict): player_id: rank, empty dict drops the ranker
+
+        Returns:
+            set: of touched player_id
+
+        '''
+        old = self.columns.get(ranker_id, {})
+        touched = set()
+        for pid, rank in old.items():
+            if column.get(pid) != rank:
+                self._remove(pid, rank)
+                touched.add(pid)
+        for pid, rank in column.items():
+            if old.get(pid) != rank:
+                self._add(pid, rank)
+                touched.add(pid)
+        if column:
+            self.columns[ranker_id] = dict(column)
+        else:
+            self.columns.pop(ranker_id, None)
+        self._ranks = None
+        self._rescore(touched)
+        return touched
+
+    def _rescore(self, touched):
+        '''
+        Updates consensus of touched players
+
+        Args:
+            touched(set): of player_id
+
+        Returns:
+            list: of (player_id, old consensus, new consensus), sorted by player
+
+        '''
+        changes = []
+        for pid in touched:
+            old, new = self.consensus.get(pid), self._score(pid)
+            if new is None:
+                self.consensus.pop(pid, None)
+            else:
+                self.consensus[pid] = new
+            if old != new:
+                changes.append((pid, old, new))
+        return sorted(changes, key=lambda x: str(x[0]))
+
+    def _align(self, matrix):
+        '''
+        Previous ranks in layout of matrix, reuses last board if layout is unchanged
+        Otherwise rebuilds from columns and drops players no longer on the board
+
+        Args:
+            matrix(RankingMatrix):
+
+        Returns:
+            tuple: ndarray of previous ranks (nan if unranked), set of touched player_id
+
+        '''
+        if self._ranks is not None and self._player_ids == matrix.player_ids and \
+           self._ranker_ids == matrix.ranker_ids:
+            return self._ranks, set()
+        touched = set()
+        prev = np.full(matrix.ranks.shape, np.nan)
+        rows = {pid: i for i, pid in enumerate(matrix.player_ids)}
+        cols = {rid: j for j, rid in enumerate(matrix.ranker_ids)}
+        for rid, column in list(self.columns.items()):
+            j = cols.get(rid)
+            for pid, rank in list(column.items()):
+                i = rows.get(pid)
+                if i is None or j is None:
+                    self._remove(pid, rank)
+                    del column[pid]
+                    touched.add(pid)
+                else:
+                    prev[i, j] = rank
+            if not column:
+                del self.columns[rid]
+        return prev, touched
+
+    def refresh(self, matrix):
+        '''
+        Applies a new board, only rankers whose column changed are processed
+        Rankers missing from matrix are dropped
+
+        Args:
+            matrix(RankingMatrix): from Parser.bestball_matrix
+
+        Returns:
+            list: of (player_id, old consensus, new consensus), None if unranked
+
+        '''
+        prev, touched = self._align(matrix)
+        cur = matrix.ranks
+        same = (prev == cur) | (np.isnan(prev) & np.isnan(cur))
+        for j in np.flatnonzero(~same.all(axis=0)):
+            ranker_id = matrix.ranker_ids[j]
+            column = self.columns.setdefault(ranker_id, {})
+            for i in np.flatnonzero(~same[:, j]):
+                pid = matrix.player_ids[i]
+                old, new = prev[i, j], cur[i, j]
+                if not np.isnan(old):
+                    self._remove(pid, old.item())
+                    del column[pid]
+                if not np.isnan(new):
+                    self._add(pid, new.item())
+                    column[pid] = new.item()
+                touched.add(pid)
+            if not column:
+                del self.columns[ranker_id]
+        self._ranks = cur.copy()
+        self._player_ids = list(matrix.player_ids)
+        self._ranker_ids = list(matrix.ranker_ids)
+        return self._rescore(touched)
+
 
 class Agent():
     '''
@@ -234,6 +745,29 @@ class Agent():
         content = self._s.weekly_projections(week)
         return self._p.weekly_projections(content)
 
+    def season_projections(self, weeks=range(1, 18), stats=None, max_workers=4):
+        '''
+        Gets PFF weekly projections for all weeks concurrently
+
+        Args:
+            weeks(iterable): of int
+            stats(list): stat keys, default every numeric field
+            max_workers(int): number of threads
+
+        Returns:
+            ProjectionCube
+
+        '''
+        weekly = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.weekly_projections, week): week for week in weeks}
+            for future in as_completed(futures):
+                try:
+                    weekly[futures[future]] = future.result()
+                except Exception:
+                    logging.exception('could not get week %s', futures[future])
+        return self._p.projection_cube(weekly, stats)
+
 
 if __name__ == '__main__':
     pass
@@ -0,0 +1,117 @@
+'''
+
+# nflfantasy/ratelimit.py
+# politeness helpers for concurrent scrapers
+
+'''
+
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostThrottle():
+    '''
+    Enforces minimum interval between requests to the same host
+    Safe to share between threads
+
+    '''
+
+    def __init__(self, min_interval=1.0):
+        '''
+
+        Args:
+            min_interval(float): seconds between requests to one host
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        '''
+        Blocks until a request to the url's host is allowed
+
+        Args:
+            url(str): full url or host name
+
+        Returns:
+            float: seconds waited
+
+        '''
+        host = urlparse(url).netloc or url
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.min_interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class TokenBucket():
+    '''
+    Token bucket rate limiter, refills at rate tokens per second
+    Safe to share between threads
+
+    '''
+
+    def __init__(self, rate, capacity=1):
+        '''
+
+        Args:
+            rate(float): tokens added per second
+            capacity(int): largest burst
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        '''
+        Takes tokens without blocking, callers wait the returned seconds
+        Useful from asyncio code that sleeps with asyncio.sleep
+
+        Args:
+            tokens(int):
+
+        Returns:
+            float: seconds to wait before proceeding
+
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        '''
+        Blocks until tokens are available
+
+        Args:
+            tokens(int):
+
+        Returns:
+            float: seconds waited
+
+        '''
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+if __name__ == '__main__':
+    pass
@@ -1,10 +1,24 @@
+import html
+import json
 import logging
+import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from bs4 import BeautifulSoup
+import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 from sportscraper.scraper import RequestScraper
 
+from nflfantasy.ratelimit import HostThrottle
+
 
 class Scraper(RequestScraper):
     '''
@@ -42,29 +56,162 @@ class Parser():
         '''
         logging.getLogger(__name__).addHandler(logging.NullHandler())
 
+    @staticmethod
+    def _header(item):
+        '''
+        Normalizes ssv header item (DK points -> dk_points)
+
+        Args:
+            item(str):
+
+        Returns:
+            str
+
+        '''
+        return item.strip().lower().replace(' ', '_').replace('/', '')
+
+    @staticmethod
+    def _lines(content, start, end):
+        '''
+        Yields lines between start and end without splitting whole block
+
+        Args:
+            content(str):
+            start(int): index of first character
+            end(int): index after last character
+
+        Returns:
+            generator: of str
+
+        '''
+        while start < end:
+            stop = content.find('\n', start, end)
+            if stop == -1:
+                stop = end
+            yield content[start:stop].rstrip('\r')
+            start = stop + 1
+
+    def _typed(self, row):
+        '''
+        Converts numeric values in ssv row
+
+        Args:
+            row(dict): of str
+
+        Returns:
+            dict
+
+        '''
+        for k, v in row.items():
+            if k in ('week', 'year', 'gid') or k.endswith('salary'):
+                v = re.sub("[^0-9]", "", v)
+                row[k] = int(v) if v else None
+            elif k.endswith('points'):
+                try:
+                    row[k] = float(v)
+                except ValueError:
+                    row[k] = None
+        return row
+
+    def dfs_week_iter(self, content, typed=True):
+        '''
+        Lazily parses weekly dfs results (ssv content wrapped by <pre>)
+        Finds ssv block in raw page rather than building html tree
+
+        Args:
+            content(str): HTML, bytes are decoded as latin-1
+            typed(bool): convert week, year, gid, salary and points
+
+        Returns:
+            generator: of dict
+
+        '''
+        if isinstance(content, bytes):
+            content = content.decode('latin-1')
+        pos = content.find('Week;Year')
+        while pos != -1:
+            end = content.find('</pre>', pos)
+            if end == -1:
+                end = len(content)
+            lines = self._lines(content, pos, end)
+            headers = [self._header(item) for item in next(lines).split(';')]
+            for line in lines:
+                if not line.strip():
+                    continue
+                if '&' in line:
+                    line = html.unescape(line)
+                row = dict(zip(headers, line.split(';')))
+                if typed:
+                    yield self._typed(row)
+                else:
+                    if row.get('salary', None):
+                        row['salary'] = re.sub("[^0-9]", "", row['salary'])
+                    yield row
+            pos = content.find('Week;Year', end)
+
     def dfs_week(self, content):
         '''
         Parses weekly dfs results (ssv content wrapped by <pre>)
 
         Args:
-            content:
+            content(str): HTML
+
+        Returns:
+            list: of dict, values are str
+
+        '''
+        return list(self.dfs_week_iter(content, typed=False))
+
+    def dfs_frame(self, rows):
+        '''
+        Converts typed dfs rows to columnar DataFrame
+        Site-prefixed points and salary become points, salary and site columns
+
+        Args:
+            rows(iterable): of dict from dfs_week_iter
+
+        Returns:
+            DataFrame
+
+        '''
+        headers = None
+        cols = {}
+        for row in rows:
+            if headers is None:
+                headers = list(row)
+                cols = {k: [] for k in headers}
+            for k in headers:
+                cols[k].append(row.get(k))
+        if not headers:
+            return pd.DataFrame()
+
+        site = None
+        for k in headers:
+            if k.endswith('_points') or k.endswith('_salary'):
+                site, col = k.split('_', 1)
+                cols[col] = cols.pop(k)
+        df = pd.DataFrame(cols)
+        if site:
+            df['site'] = site
+
+        dtypes = {'week': 'int16', 'year': 'int16', 'gid': 'Int32',
+                  'points': 'float32', 'salary': 'Int32', 'pos': 'category',
+                  'team': 'category', 'ha': 'category', 'oppt': 'category',
+                  'site': 'category'}
+        return df.astype({k: v for k, v in dtypes.items() if k in df.columns})
+
+    def dfs_week_frame(self, content):
+        '''
+        Parses weekly dfs results into typed columnar DataFrame
+
+        Args:
+            content(str): HTML
 
         Returns:
+            DataFrame
 
         '''
-        vals = []
-        soup = BeautifulSoup(content, 'lxml')
-        for pre in soup.findAll('pre'):
-            if 'Week;Year' in pre.text:
-                rows = pre.text.split('\n')
-                headers = [item.strip().lower().replace(' ', '_').replace('/', '')
-                           for item in rows[0].split(';')]
-                for row in rows[1:]:
-                    sal = dict(list(zip(headers, row.split(';'))))
-                    if sal.get('salary', None):
-                        sal['salary'] = re.sub("[^0-9]", "", sal['salary'])
-                    vals.append(sal)
-        return vals
+        return self.dfs_frame(self.dfs_week_iter(content))
 
 
 class Agent():
@@ -73,24 +220,270 @@ class Agent():
 
     def __init__(self, cache_name='fpros-nfl-agent'):
         logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.cache_name = cache_name
         self._s = Scraper(cache_name=cache_name)
         self._p = Parser()
 
-    def dfs_week(self, season_year, week, site):
+    @staticmethod
+    def _read_manifest(manifest):
+        '''
+        Reads completed (season_year, week, site) from manifest
+
+        Args:
+            manifest(str): path of json-lines file
+
+        Returns:
+            set: of tuple
+
+        '''
+        done = set()
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                for line in f:
+                    if line.strip():
+                        d = json.loads(line)
+                        done.add((d['season_year'], d['week'], d['site']))
+        return done
+
+    def _backfill_week(self, key, throttle, local):
+        '''
+        Fetches and parses one week in a worker thread
+
+        Args:
+            key(tuple): season_year, week, site
+            throttle(HostThrottle):
+            local(threading.local): holds per-thread scraper
+
+        Returns:
+            list: of dict
+
+        '''
+        if not hasattr(local, 'scraper'):
+            local.scraper = Scraper(cache_name=self.cache_name)
+        throttle.wait('http://rotoguru1.com/')
+        content = local.scraper.dfs_week(*key)
+        return list(self._p.dfs_week_iter(content))
+
+    def dfs_week(self, season_year, week, site, as_frame=False):
         '''
 
         Args:
             season_year(int): 2015 -
             week(int): 1-17
             site(str): 'dk', 'fd'
+            as_frame(bool): return typed DataFrame rather than list of dict
 
         Returns:
-            str - HTML
+            list: of dict, or DataFrame
 
         '''
         content = self._s.dfs_week(season_year, week, site)
+        if as_frame:
+            return self._p.dfs_week_frame(content)
         return self._p.dfs_week(content)
 
+    def dfs_backfill(self, seasons, weeks, sites, manifest, sink=None,
+                     max_workers=4, min_interval=1.0):
+        '''
+        Gets many weeks of dfs results using a thread pool
+        Completed weeks are recorded in manifest, so rerun only fetches missing weeks
+        Weeks without rows are not recorded and are fetched again on rerun
+
+        Args:
+            seasons(iterable): of int, 2014 -
+            weeks(iterable): of int, 1-17
+            sites(iterable): of str, 'dk', 'fd', 'yh'
+            manifest(str): path of json-lines manifest file
+            sink(callable): called with season_year, week, site, rows
+            max_workers(int): number of threads
+            min_interval(float): seconds between requests to rotoguru
+
+        Returns:
+            dict: key is (season_year, week, site), value is list of dict
+                  empty if sink is used
+
+        '''
+        results = {}
+        done = self._read_manifest(manifest)
+        todo = [(season_year, week, site) for season_year in seasons
+                for week in weeks for site in sites
+                if (season_year, week, site) not in done]
+        logging.info('%s weeks done, %s to fetch', len(done), len(todo))
+        if not todo:
+            return results
+
+        throttle = HostThrottle(min_interval)
+        local = threading.local()
+        start = time.monotonic()
+        n = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                open(manifest, 'a') as f:
+            futures = {executor.submit(self._backfill_week, key, throttle, local): key
+                       for key in todo}
+            for future in as_completed(futures):
+                season_year, week, site = key = futures[future]
+                try:
+                    rows = future.result()
+                    # unplayed week or page without data, retry on next run
+                    if not rows:
+                        logging.warning('no rows for %s %s %s', season_year, week, site)
+                        continue
+                    if sink:
+                        sink(season_year, week, site, rows)
+                    else:
+                        results[key] = rows
+                except Exception:
+                    logging.exception('could not get %s %s %s', season_year, week, site)
+                    continue
+                f.write(json.dumps({'season_year': season_year, 'week': week,
+                                    'site': site, 'rows': len(rows)}) + '\n')
+                f.flush()
+                n += 1
+                elapsed = time.monotonic() - start
+                logging.info('%s/%s weeks (%.2f weeks/sec)', n, len(todo), n / elapsed)
+        return results
+
+
+class DfsStore():
+    '''
+    Parquet store of weekly dfs results partitioned by season/week/site
+    Requires pyarrow
+
+    '''
+
+    partition_columns = ('season', 'week', 'site')
+    category_columns = ('pos', 'team', 'ha', 'oppt', 'site')
+
+    def __init__(self, root):
+        '''
+
+        Args:
+            root(str): directory of store
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        if pa is None:
+            raise ImportError('DfsStore requires pyarrow')
+        self.root = root
+        self.schema = pa.schema([('gid', pa.int32()), ('name', pa.string()),
+                                 ('pos', pa.string()), ('team', pa.string()),
+                                 ('ha', pa.string()), ('oppt', pa.string()),
+                                 ('points', pa.float32()), ('salary', pa.int32())])
+        self.partition_schema = pa.schema([('season', pa.int16()), ('week', pa.int16()),
+                                           ('site', pa.string())])
+
+    def _path(self, season_year, week, site):
+        return os.path.join(self.root, 'season={}'.format(season_year),
+                            'week={}'.format(week), 'site={}'.format(site))
+
+    def append(self, df):
+        '''
+        Writes DataFrame from Parser.dfs_frame, one file per season/week/site
+        Partitions already in store are replaced, so appends can be repeated
+
+        Args:
+            df(DataFrame):
+
+        Returns:
+            list: of (season_year, week, site) written
+
+        '''
+        written = []
+        if df.empty:
+            return written
+        cols = [name for name in self.schema.names if name in df.columns]
+        for (season_year, week, site), group in df.groupby(['year', 'week', 'site'],
+                                                           observed=True):
+            group = group[cols].astype({c: object for c in cols
+                                        if c in self.category_columns})
+            table = pa.Table.from_pandas(group, schema=pa.schema([self.schema.field(c) for c in cols]),
+                                         preserve_index=False)
+            path = self._path(season_year, week, site)
+            os.makedirs(path, exist_ok=True)
+            # leading dot so readers skip a leftover temp file
+            tmp = os.path.join(path, '.part-0.parquet.tmp')
+            pq.write_table(table, tmp)
+            os.replace(tmp, os.path.join(path, 'part-0.parquet'))
+            written.append((int(season_year), int(week), site))
+        return written
+
+    def sink(self, season_year, week, site, rows):
+        '''
+        Writes typed rows, can be passed as sink to Agent.dfs_backfill
+
+        Args:
+            season_year(int):
+            week(int):
+            site(str):
+            rows(list): of dict from Parser.dfs_week_iter
+
+        Returns:
+            None
+
+        '''
+        df = Parser().dfs_frame(rows)
+        if df.empty:
+            logging.warning('no rows for %s %s %s', season_year, week, site)
+        self.append(df)
+
+    def partitions(self):
+        '''
+        Partitions in store
+
+        Returns:
+            set: of (season_year, week, site)
+
+        '''
+        parts = set()
+        for dirpath, _, filenames in os.walk(self.root):
+            if 'part-0.parquet' in filenames:
+                vals = dict(item.split('=', 1) for item in
+                            os.path.relpath(dirpath, self.root).split(os.sep))
+                parts.add((int(vals['season']), int(vals['week']), vals['site']))
+        return parts
+
+    def read(self, seasons=None, weeks=None, sites=None, positions=None,
+             min_salary=None, max_salary=None, columns=None):
+        '''
+        Reads results, filters are pushed down to partitions and row groups
+
+        Args:
+            seasons(list): of int
+            weeks(list): of int
+            sites(list): of str
+            positions(list): of str, 'QB', etc.
+            min_salary(int):
+            max_salary(int):
+            columns(list): of str, default all columns
+
+        Returns:
+            DataFrame
+
+        '''
+        if not os.path.isdir(self.root):
+            return pd.DataFrame()
+        dataset = ds.dataset(self.root, format='parquet',
+                             schema=pa.unify_schemas([self.schema, self.partition_schema]),
+                             partitioning=ds.partitioning(self.partition_schema, flavor='hive'))
+        filters = []
+        if seasons is not None:
+            filters.append(ds.field('season').isin(list(seasons)))
+        if weeks is not None:
+            filters.append(ds.field('week').isin(list(weeks)))
+        if sites is not None:
+            filters.append(ds.field('site').isin(list(sites)))
+        if positions is not None:
+            filters.append(ds.field('pos').isin(list(positions)))
+        if min_salary is not None:
+            filters.append(ds.field('salary') >= min_salary)
+        if max_salary is not None:
+            filters.append(ds.field('salary') <= max_salary)
+        expr = None
+        for f in filters:
+            expr = f if expr is None else expr & f
+        df = dataset.to_table(filter=expr, columns=columns).to_pandas()
+        return df.astype({c: 'category' for c in self.category_columns if c in df.columns})
+
 
 if __name__ == '__main__':
     pass
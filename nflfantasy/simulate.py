@@ -0,0 +1,167 @@
+'''
+
+# nflfantasy/simulate.py
+# monte carlo lineup simulator driven by fantasymath distributions
+
+'''
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nflfantasy.distributions import PlayerDistributions
+
+
+def _norm_cdf(z):
+    '''
+    Standard normal cdf (Abramowitz & Stegun 7.1.26, error < 1.5e-7)
+
+    Args:
+        z(ndarray):
+
+    Returns:
+        ndarray
+
+    '''
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 +
+                t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+
+def _simulate_chunk(args):
+    '''
+    Simulates one block of outcomes, runs in worker process
+
+    Args:
+        args(tuple): names, knots, chol, incidence, size, seed
+
+    Returns:
+        ndarray: size x lineups of float32
+
+    '''
+    names, knots, chol, incidence, size, seed = args
+    rng = np.random.default_rng(seed)
+    dists = PlayerDistributions(names, knots)
+    if chol is None:
+        u = rng.random((size, len(names)))
+    else:
+        u = _norm_cdf(rng.standard_normal((size, len(names))) @ chol.T)
+    return (dists.ppf(u) @ incidence).astype(np.float32)
+
+
+class LineupSimulator():
+    '''
+    Samples player outcomes in vectorized blocks spread across processes
+    and scores lineups against each other
+
+    '''
+
+    percentiles = (5, 25, 50, 75, 95)
+
+    def __init__(self, dists, lineups, corr=None):
+        '''
+
+        Args:
+            dists(PlayerDistributions): or list/dict accepted by from_distributions
+            lineups(dict): lineup name: list of player names
+            corr(DataFrame): player x player correlation, default independent
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        if not isinstance(dists, PlayerDistributions):
+            dists = PlayerDistributions.from_distributions(dists)
+        self.lineup_names = list(lineups)
+        players = list(dict.fromkeys(p for lineup in lineups.values() for p in lineup))
+        self.dists = dists.subset(players)
+
+        # players x lineups, a player can be in several lineups
+        self.incidence = np.zeros((len(players), len(lineups)))
+        for j, lineup in enumerate(lineups.values()):
+            for p in lineup:
+                self.incidence[self.dists.index[p], j] += 1
+
+        self.chol = None
+        if corr is not None:
+            corr = corr.reindex(index=players, columns=players).fillna(0)
+            corr = corr.to_numpy(dtype=float, copy=True)
+            np.fill_diagonal(corr, 1)
+            self.chol = np.linalg.cholesky(corr)
+
+    def scores(self, n=100000, chunk_size=10000, processes=None, seed=None):
+        '''
+        Simulates lineup scores
+
+        Args:
+            n(int): number of simulations
+            chunk_size(int): simulations per task
+            processes(int): default cpu count, 1 runs in this process
+            seed(int): for reproducible results
+
+        Returns:
+            ndarray: n x lineups
+
+        '''
+        sizes = [chunk_size] * (n // chunk_size)
+        if n % chunk_size:
+            sizes.append(n % chunk_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        tasks = [(self.dists.names, self.dists.knots, self.chol, self.incidence, size, ss)
+                 for size, ss in zip(sizes, seeds)]
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = min(processes, len(tasks))
+        if processes <= 1:
+            return np.concatenate([_simulate_chunk(task) for task in tasks])
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return np.concatenate(list(executor.map(_simulate_chunk, tasks)))
+
+    def simulate(self, n=100000, matchups=None, chunk_size=10000, processes=None, seed=None):
+        '''
+        Simulates lineups and summarizes results
+        win_prob is over listed matchups, or chance of top score if no matchups
+
+        Args:
+            n(int): number of simulations
+            matchups(list): of (lineup name, lineup name)
+            chunk_size(int): simulations per task
+            processes(int): default cpu count
+            seed(int): for reproducible results
+
+        Returns:
+            DataFrame: indexed by lineup name
+
+        '''
+        scores = self.scores(n, chunk_size, processes, seed)
+        df = pd.DataFrame({'expected': scores.mean(axis=0)}, index=self.lineup_names)
+        for pct, vals in zip(self.percentiles,
+                             np.percentile(scores, self.percentiles, axis=0)):
+            df['p{}'.format(pct)] = vals
+
+        if matchups:
+            idx = {name: i for i, name in enumerate(self.lineup_names)}
+            wins = np.zeros(len(self.lineup_names))
+            games = np.zeros(len(self.lineup_names))
+            for a, b in matchups:
+                i, j = idx[a], idx[b]
+                p = (scores[:, i] > scores[:, j]).mean() + \
+                    (scores[:, i] == scores[:, j]).mean() / 2
+                wins[i] += p
+                wins[j] += 1 - p
+                games[i] += 1
+                games[j] += 1
+            df['win_prob'] = np.divide(wins, games, out=np.full_like(wins, np.nan),
+                                       where=games > 0)
+        else:
+            top = np.bincount(scores.argmax(axis=1), minlength=len(self.lineup_names))
+            df['win_prob'] = top / len(scores)
+        return df
+
+
+if __name__ == '__main__':
+    pass
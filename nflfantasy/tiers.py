@@ -0,0 +1,157 @@
+'''
+
+# nflfantasy/tiers.py
+# optimal 1-D tiering of rank and score columns
+
+'''
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def _layer(prev, q, cost):
+    '''
+    One row of the k-means dp, D[q][i] = min over j of D[q-1][j-1] + cost(j, i)
+    The best j is monotone in i, so every mid-point of each recursion depth
+    is solved in one vectorized pass (divide and conquer, O(n log n))
+
+    Args:
+        prev(ndarray): D[q-1]
+        q(int): number of earlier tiers
+        cost(callable): cost(j, i) of one tier x[j..i], vectorized
+
+    Returns:
+        tuple: D[q], first index of last tier
+
+    '''
+    n = len(prev)
+    cur = np.full(n, np.inf)
+    arg = np.zeros(n, dtype=int)
+    seg = np.array([[q, n - 1, q, n - 1]])
+    while len(seg):
+        lo_i, hi_i, lo_j, hi_j = seg.T
+        mid = (lo_i + hi_i) // 2
+        top = np.minimum(hi_j, mid)
+        sizes = top - lo_j + 1
+        owner = np.repeat(np.arange(len(seg)), sizes)
+        offsets = np.cumsum(sizes) - sizes
+        j = lo_j[owner] + np.arange(sizes.sum()) - offsets[owner]
+        vals = prev[j - 1] + cost(j, mid[owner])
+        order = np.lexsort((vals, owner))
+        first = order[offsets]
+        cur[mid] = vals[first]
+        arg[mid] = best = j[first]
+        left = np.column_stack([lo_i, mid - 1, lo_j, best])[lo_i <= mid - 1]
+        right = np.column_stack([mid + 1, hi_i, best, hi_j])[mid + 1 <= hi_i]
+        seg = np.concatenate([left, right])
+    return cur, arg
+
+
+def optimal_breaks(values, k, weights=None):
+    '''
+    Exact 1-D k-means (Ckmeans) of values, minimizes within-tier sum of squares
+
+    Args:
+        values(iterable): of float, no nan
+        k(int): number of tiers, reduced to number of distinct values
+        weights(iterable): of float, default equal weight
+
+    Returns:
+        tuple: labels (ndarray of int, 1 is lowest values, input order), sse per k
+
+    '''
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    if not n:
+        return np.zeros(0, dtype=int), np.zeros(0)
+    w = np.ones(n) if weights is None else np.asarray(weights, dtype=float)
+    k = max(1, min(int(k), len(np.unique(x))))
+    order = np.argsort(x, kind='stable')
+    xs, ws = x[order], w[order]
+    sw = np.concatenate([[0], np.cumsum(ws)])
+    swx = np.concatenate([[0], np.cumsum(ws * xs)])
+    swx2 = np.concatenate([[0], np.cumsum(ws * xs * xs)])
+
+    def cost(j, i):
+        tw = sw[i + 1] - sw[j]
+        tx = swx[i + 1] - swx[j]
+        return np.maximum(swx2[i + 1] - swx2[j] - tx * tx / tw, 0)
+
+    rows = [cost(np.zeros(n, dtype=int), np.arange(n))]
+    args = [np.zeros(n, dtype=int)]
+    for q in range(1, k):
+        cur, arg = _layer(rows[-1], q, cost)
+        rows.append(cur)
+        args.append(arg)
+
+    labels = np.empty(n, dtype=int)
+    hi = n - 1
+    for q in range(k - 1, -1, -1):
+        lo = args[q][hi]
+        labels[order[lo:hi + 1]] = q + 1
+        hi = lo - 1
+    return labels, np.array([row[-1] for row in rows])
+
+
+def tiers(values, k, weights=None):
+    '''
+    Tier labels for a column, missing values get tier 0
+
+    Args:
+        values(iterable): of float
+        k(int): number of tiers
+        weights(iterable): of float
+
+    Returns:
+        ndarray: of int
+
+    '''
+    x = pd.to_numeric(pd.Series(list(values)), errors='coerce').to_numpy(dtype=float)
+    ok = ~np.isnan(x)
+    w = None
+    if weights is not None:
+        w = pd.to_numeric(pd.Series(list(weights)), errors='coerce').to_numpy(dtype=float)
+        ok &= ~np.isnan(w) & (w > 0)
+        w = w[ok]
+    labels = np.zeros(len(x), dtype=int)
+    labels[ok] = optimal_breaks(x[ok], k, w)[0]
+    return labels
+
+
+def tier_frame(df, column, k, by=None, weight_column=None, tier_column='tier'):
+    '''
+    Adds tiers to a board, e.g. PFF avg or fantasypros avg by position
+    A stdev column can weight players with 1 / stdev ** 2
+
+    Args:
+        df(DataFrame): or list of dict, such as bestball_rankings
+        column(str): rank or score column
+        k(int): tiers per group
+        by(str): group column, such as 'pos'
+        weight_column(str): stdev column
+        tier_column(str): name of new column
+
+    Returns:
+        DataFrame
+
+    '''
+    df = pd.DataFrame(df).copy()
+    weights = None
+    if weight_column:
+        std = pd.to_numeric(df[weight_column], errors='coerce')
+        weights = 1 / std.clip(lower=1e-6) ** 2
+    df[tier_column] = 0
+    groups = df.groupby(by, sort=False).groups.values() if by else [df.index]
+    for idx in groups:
+        w = None if weights is None else weights.loc[idx]
+        df.loc[idx, tier_column] = tiers(df.loc[idx, column], k, w)
+    return df
+
+
+if __name__ == '__main__':
+    pass
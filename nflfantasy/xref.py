@@ -5,11 +5,461 @@ provides classes for matching players across sites
 '''
 import abc
 import logging
+import os
+import re
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 from playermatcher.match import player_match
 from playermatcher.name import first_last
 
+try:
+    from rapidfuzz import fuzz
+    from rapidfuzz.process import cdist
+except ImportError:
+    cdist = None
+
+
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+
+def last_name(name):
+    '''
+    Lowercase last name without suffix or punctuation
+
+    Args:
+        name(str): first last
+
+    Returns:
+        str
+
+    '''
+    parts = [re.sub(r'[^a-z]', '', t) for t in name.lower().split()]
+    parts = [t for t in parts if t]
+    while len(parts) > 1 and parts[-1] in SUFFIXES:
+        parts.pop()
+    return parts[-1] if parts else ''
+
+
+def soundex(s):
+    '''
+    American soundex code of a word
+
+    Args:
+        s(str):
+
+    Returns:
+        str: such as 'R163', empty if no letters
+
+    '''
+    s = re.sub(r'[^a-z]', '', s.lower())
+    if not s:
+        return ''
+    codes = {c: str(d) for d, letters in enumerate(
+        ['aeiouy', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for c in letters}
+    out = s[0].upper()
+    prev = codes.get(s[0], '')
+    for c in s[1:]:
+        code = codes.get(c, '')
+        if code and code != '0' and code != prev:
+            out += code
+        # h and w do not separate letters with the same code
+        if c not in 'hw':
+            prev = code
+    return (out + '000')[:4]
+
+
+class BlockingIndex():
+    '''
+    Groups site player names by last-name prefix and soundex
+    so fuzzy matching only scores a handful of candidates
+
+    '''
+
+    def __init__(self, players, name_key='source_player_name', pos_key='dfs_position',
+                 team_key=None, prefix=3):
+        '''
+
+        Args:
+            players(list): of dict
+            name_key(str): name field of players
+            pos_key(str): position field, None to ignore position
+            team_key(str): team field, None to ignore team
+            prefix(int): length of last-name prefix key
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.prefix = prefix
+        self.names = []
+        self._order = {}
+        self.blocks = defaultdict(set)
+        self.positions = {}
+        self.teams = defaultdict(set)
+        for p in players:
+            name = p[name_key]
+            if name not in self.positions:
+                self._order[name] = len(self.names)
+                self.names.append(name)
+                self.positions[name] = set()
+                for k in self.keys(name):
+                    self.blocks[k].add(name)
+            if pos_key and p.get(pos_key):
+                self.positions[name].add(str(p[pos_key]).upper())
+            if team_key and p.get(team_key):
+                self.teams[name].add(str(p[team_key]).upper())
+
+    def keys(self, name):
+        '''
+        Blocking keys of a name
+
+        Args:
+            name(str): first last
+
+        Returns:
+            list: of tuple
+
+        '''
+        last = last_name(name)
+        if not last:
+            return []
+        return [('prefix', last[:self.prefix]), ('soundex', soundex(last))]
+
+    def candidates(self, name, pos=None, team=None):
+        '''
+        Site names sharing a blocking key with name
+        Position and team narrow candidates only when they leave some behind
+
+        Args:
+            name(str): first last
+            pos(str): position
+            team(str): team code
+
+        Returns:
+            list: of str, in index order
+
+        '''
+        found = set()
+        for k in self.keys(name):
+            found |= self.blocks.get(k, set())
+        for val, attrs in ((pos, self.positions), (team, self.teams)):
+            if val:
+                narrowed = {n for n in found if str(val).upper() in attrs.get(n, ())}
+                if narrowed:
+                    found = narrowed
+        return sorted(found, key=self._order.get)
+
+
+def match_candidates(name, index, pos=None, team=None, fallback=True, thresh=90,
+                     interactive=False):
+    '''
+    Fuzzy matches name against its blocked candidates
+
+    Args:
+        name(str): first last
+        index(BlockingIndex):
+        pos(str): position
+        team(str): team code
+        fallback(bool): score every site name when blocking finds nothing
+        thresh(int): player_match threshold
+        interactive(bool):
+
+    Returns:
+        str: matched site name or None
+
+    '''
+    names = index.candidates(name, pos, team)
+    if not names:
+        if not fallback:
+            return None
+        names = index.names
+    return player_match(name, names, thresh=thresh, interactive=interactive)
+
+
+def normalize_name(name):
+    '''
+    Lowercase name without punctuation or suffix
+
+    Args:
+        name(str): first last
+
+    Returns:
+        str
+
+    '''
+    parts = [re.sub(r'[^a-z0-9]', '', t) for t in name.lower().split()]
+    parts = [t for t in parts if t]
+    while len(parts) > 1 and parts[-1] in SUFFIXES:
+        parts.pop()
+    return ' '.join(parts)
+
+
+def _bigrams(names, vocab):
+    '''
+    Binary names x bigrams matrix, names are padded with spaces
+
+    Returns:
+        ndarray: of float32
+
+    '''
+    m = np.zeros((len(names), len(vocab)), dtype=np.float32)
+    for i, name in enumerate(names):
+        padded = ' {} '.format(name)
+        m[i, [vocab[padded[j:j + 2]] for j in range(len(padded) - 1)]] = 1
+    return m
+
+
+def _similarity(queries, names, backend):
+    '''
+    Similarity matrix of normalized names, 0-100
+
+    Args:
+        queries(list): of str
+        names(list): of str
+        backend(str): 'rapidfuzz' or 'bigram' (dice coefficient of bigrams)
+
+    Returns:
+        ndarray: queries x names
+
+    '''
+    if backend == 'rapidfuzz':
+        return cdist(queries, names, scorer=fuzz.ratio, dtype=np.float32)
+    vocab = {}
+    for name in list(queries) + list(names):
+        padded = ' {} '.format(name)
+        for j in range(len(padded) - 1):
+            vocab.setdefault(padded[j:j + 2], len(vocab))
+    q, n = _bigrams(queries, vocab), _bigrams(names, vocab)
+    sizes = q.sum(axis=1)[:, None] + n.sum(axis=1)[None, :]
+    return 200 * (q @ n.T) / np.maximum(sizes, 1)
+
+
+# bigram dice scores variants such as Mitch / Mitchell lower than fuzz.ratio
+BATCH_THRESH = {'rapidfuzz': 90, 'bigram': 75}
+
+
+def _best_two(args):
+    '''
+    Best and second best site name for a chunk of queries, runs in worker process
+
+    Args:
+        args(tuple): queries, names, backend, query positions, name positions
+
+    Returns:
+        tuple: best index, best score, second score
+
+    '''
+    queries, names, backend, qpos, npos = args
+    scores = _similarity(queries, names, backend)
+    if qpos is not None and npos is not None:
+        qpos, npos = np.asarray(qpos)[:, None], np.asarray(npos)[None, :]
+        scores[(qpos != '') & (npos != '') & (qpos != npos)] = 0
+    rows = np.arange(len(scores))
+    best = scores.argmax(axis=1)
+    top = scores[rows, best]
+    if scores.shape[1] < 2:
+        return best, top, np.zeros(len(rows))
+    scores[rows, best] = -1
+    return best, top, scores.max(axis=1)
+
+
+def batch_match(queries, names, thresh=None, margin=5, backend=None, processes=None,
+                chunk_size=500, query_positions=None, name_positions=None):
+    '''
+    Matches every query name to site names in one vectorized pass
+    A match needs score >= thresh and a lead of margin over the next best name
+    Names with known, different positions never match
+
+    Args:
+        queries(list): of str, first last
+        names(list): of str, site names
+        thresh(float): minimum score, 0-100, default BATCH_THRESH of backend
+        margin(float): minimum lead over second best
+        backend(str): 'rapidfuzz' or 'bigram', default rapidfuzz if installed
+        processes(int): default 1 for small rosters, else cpu count
+        chunk_size(int): queries per task
+        query_positions(list): position of each query, None or '' if unknown
+        name_positions(list): position of each site name, None or '' if unknown
+
+    Returns:
+        list: matched site name or None, same order as queries
+
+    '''
+    names = list(names)
+    if not queries or not names:
+        return [None] * len(queries)
+    if backend is None:
+        backend = 'rapidfuzz' if cdist else 'bigram'
+    if backend not in ('rapidfuzz', 'bigram'):
+        raise ValueError('invalid backend: {}'.format(backend))
+    if backend == 'rapidfuzz' and not cdist:
+        raise ValueError('rapidfuzz is not installed')
+    if thresh is None:
+        thresh = BATCH_THRESH[backend]
+
+    qn = [normalize_name(q) for q in queries]
+    nn = [normalize_name(n) for n in names]
+    qpos = npos = None
+    if query_positions is not None and name_positions is not None:
+        qpos = [str(pos or '').upper() for pos in query_positions]
+        npos = [str(pos or '').upper() for pos in name_positions]
+    tasks = [(qn[i:i + chunk_size], nn, backend, qpos and qpos[i:i + chunk_size], npos)
+             for i in range(0, len(qn), chunk_size)]
+    if processes is None:
+        processes = 1 if len(qn) * len(nn) <= 1000000 else os.cpu_count() or 1
+    processes = min(processes, len(tasks))
+    if processes <= 1:
+        results = [_best_two(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_best_two, tasks))
+
+    best, top, second = (np.concatenate(arr) for arr in zip(*results))
+    ok = (top >= thresh) & (top - second >= margin)
+    return [names[b] if m else None for b, m in zip(best.tolist(), ok.tolist())]
+
+
+class FrozenIndex(dict):
+    '''
+    Read-only dict of key: tuple of rows, safe to hand out from a shared snapshot
+
+    '''
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('snapshot index is read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+class Snapshot():
+    '''
+    Table loaded once and indexed in memory
+    Reloads when row count, max timestamp or checksum changes,
+    checked at most every max_age seconds
+    Without timestamp_column or checksum only inserts and deletes are seen
+
+    '''
+
+    def __init__(self, db, table, timestamp_column=None, max_age=60, checksum=None):
+        '''
+
+        Args:
+            db(NFLPostgres): instance
+            table(str): table or view name
+            timestamp_column(str): column whose max changes on update
+            max_age(float): seconds between version checks, 0 checks every call
+            checksum(str): sql expression summed over rows, changes on update
+
+        '''
+        logging.getLogger(__name__).addHandler(logging.NullHandler())
+        self.db = db
+        self.table = table
+        self.timestamp_column = timestamp_column
+        self.checksum = checksum
+        self.max_age = max_age
+        self._rows = None
+        self._version = None
+        self._checked = 0
+        self._indexes = {}
+
+    def version(self):
+        '''
+        Cheap version of table
+
+        Returns:
+            tuple: row count, max timestamp, checksum
+
+        '''
+        cols = ['count(*) AS n']
+        if self.timestamp_column:
+            cols.append('max({}) AS ts'.format(self.timestamp_column))
+        if self.checksum:
+            cols.append('sum({}) AS cs'.format(self.checksum))
+        row = self.db.select_dict('SELECT {} FROM {}'.format(', '.join(cols), self.table))[0]
+        return row['n'], row.get('ts'), row.get('cs')
+
+    def refresh(self, force=False):
+        '''
+        Reloads table if version changed
+
+        Args:
+            force(bool): check version even if checked within max_age
+
+        Returns:
+            bool: True if table was reloaded
+
+        '''
+        now = time.monotonic()
+        if self._rows is not None and not force and now - self._checked < self.max_age:
+            return False
+        version = self.version()
+        self._checked = now
+        if self._rows is not None and version == self._version:
+            return False
+        logging.info('loading %s', self.table)
+        self._rows = self.db.select_dict('SELECT * FROM {}'.format(self.table))
+        self._version = version
+        self._indexes = {}
+        return True
+
+    def rows(self):
+        '''
+        All rows of table
+
+        Returns:
+            list: of dict
+
+        '''
+        self.refresh()
+        return self._rows
+
+    def index(self, name, keyfunc):
+        '''
+        Rows grouped by key, built once per version
+
+        Args:
+            name(str): index name
+            keyfunc(callable): row -> key
+
+        Returns:
+            FrozenIndex: key: tuple of dict
+
+        '''
+        self.refresh()
+        if name not in self._indexes:
+            d = defaultdict(list)
+            for row in self._rows:
+                d[keyfunc(row)].append(row)
+            self._indexes[name] = FrozenIndex((k, tuple(v)) for k, v in d.items())
+        return self._indexes[name]
+
+
+_SNAPSHOTS = {}
+
+
+def snapshot(db, table, timestamp_column=None, max_age=60, checksum=None):
+    '''
+    Snapshot of table shared in this process by callers with the same arguments
+
+    Args:
+        db(NFLPostgres): instance
+        table(str): table or view name
+        timestamp_column(str): column whose max changes on update
+        max_age(float): seconds between version checks
+        checksum(str): sql expression summed over rows
+
+    Returns:
+        Snapshot
+
+    '''
+    key = (id(db), table, timestamp_column, max_age, checksum)
+    snap = _SNAPSHOTS.get(key)
+    if snap is None or snap.db is not db:
+        snap = _SNAPSHOTS[key] = Snapshot(db, table, timestamp_column, max_age, checksum)
+    return snap
+
 
 class Site(metaclass=abc.ABCMeta):
     '''
@@ -65,15 +515,33 @@ class Fanball(Site):
 
     '''
 
-    def __init__(self, db):
+    # team field of site players view, None if it has no team
+    team_column = None
+
+    # column of site players view whose max changes on update
+    # None checks row count only, so in-place updates are not seen
+    timestamp_column = None
+
+    # column of xref table whose max changes on update, None uses xref_checksum
+    xref_timestamp_column = None
+    # postgres hashtext, summed to detect in-place updates
+    xref_checksum = ("hashtext(CAST(mfl_player_id AS TEXT) || '_' || "
+                     "CAST(fb_player_id AS TEXT))")
+
+    def __init__(self, db, max_age=60):
         '''
 
         Args:
             db(NFLPostgres): instance
+            max_age(float): seconds between checks for changed tables
 
         '''
         logging.getLogger(__name__).addHandler(logging.NullHandler())
         self.db = db
+        xref_checksum = None if self.xref_timestamp_column else self.xref_checksum
+        self._xref = snapshot(db, 'dfs.fb_mfl_xref', self.xref_timestamp_column, max_age,
+                              xref_checksum)
+        self._players = snapshot(db, 'dfs.vw_fb_players', self.timestamp_column, max_age)
 
     def add_xref(self, *players):
         '''
@@ -100,11 +568,10 @@ class Fanball(Site):
             dict - mfl_player_id: fanball_id or vice versa
 
         '''
-        q = """SELECT mfl_player_id as m, fb_player_id as f FROM dfs.fb_mfl_xref"""
-        players = self.db.select_dict(q)
+        players = self._xref.rows()
         if first == 'mfl':
-            return {p['m']: p['f'] for p in players}
-        return {p['m']: p['f'] for p in players}
+            return {p['mfl_player_id']: p['fb_player_id'] for p in players}
+        return {p['mfl_player_id']: p['fb_player_id'] for p in players}
 
     def get_players(self):
         '''
@@ -114,37 +581,37 @@ class Fanball(Site):
             list
 
         '''
-        q = """SELECT * FROM dfs.vw_fb_players"""
-        return self.db.select_dict(q)
+        return list(self._players.rows())
 
     def get_playersd(self, key='name'):
         '''
         Gets MFL players from salary table
 
         Args:
-            key(str):
+            key(str): 'name', 'namepos' or 'id'
 
         Returns:
-            dict
+            FrozenIndex: read-only, key: tuple of dict
 
         '''
-        d = defaultdict(list)
-        q = """SELECT * FROM dfs.vw_fb_players"""
         if key == 'name':
-            for p in self.db.select_dict(q):
-                d[p['source_player_name']].append(p)
+            d = self._players.index(key, lambda p: p['source_player_name'])
         elif key == 'namepos':
-            for p in self.db.select_dict(q):
-                k = '{}_{}'.format(p['source_player_name'], p['dfs_position'])
-                d[k].append(p)
+            d = self._players.index(
+                key, lambda p: '{}_{}'.format(p['source_player_name'], p['dfs_position']))
+        elif key == 'id':
+            d = self._players.index(key, lambda p: p['fb_player_id'])
         else:
             raise ValueError('invalid key name: {}'.format(key))
         return d
 
     def match_mfl(self, mfl_players, id_key, name_key,
-                  pos_key=None, interactive=False):
+                  pos_key=None, interactive=False, team_key=None, fallback=True,
+                  batch=False):
         '''
         Matches mfl players to fanball players
+        Fuzzy matching only scores names that share a blocking key,
+        batch=True scores all unmatched players in one vectorized pass
 
         Args:
             mfl_players(list):
@@ -152,6 +619,9 @@ class Fanball(Site):
             name_key(str):
             pos_key(str):
             interactive(bool):
+            team_key(str): mfl team field, used if site players have team
+            fallback(bool): score all site names when blocking finds nothing
+            batch(bool): use batch_match instead of blocking when not interactive
 
         Returns:
             list: of player
@@ -159,18 +629,36 @@ class Fanball(Site):
         '''
         d = self.get_mfld(first='mfl')
         fbd = self.get_playersd('name')
-        fb_playernames = list(fbd.keys())
+        index = BlockingIndex([p for players in fbd.values() for p in players],
+                              team_key=self.team_column)
 
+        unmatched = []
         for idx, p in enumerate(mfl_players):
             # first option is to see if already in database
             if d.get(p[id_key]):
                 mfl_players[idx]['fb_player_id'] = d[p[id_key]]
-                continue
+            else:
+                unmatched.append(idx)
+
+        use_batch = batch and not interactive
+        if use_batch:
+            qpos = [mfl_players[idx].get(pos_key) if pos_key else None for idx in unmatched]
+            npos = [next(iter(index.positions[n])) if len(index.positions[n]) == 1 else None
+                    for n in index.names]
+            match_names = batch_match([first_last(mfl_players[idx][name_key])
+                                       for idx in unmatched], index.names,
+                                      query_positions=qpos, name_positions=npos)
+        else:
+            match_names = [None] * len(unmatched)
 
+        for idx, match_name in zip(unmatched, match_names):
+            p = mfl_players[idx]
             # if not in database, use matcher
-            # player
-            match_name = player_match(first_last(p[name_key]), fb_playernames, thresh=90,
-                                      interactive=interactive)
+            if not use_batch:
+                match_name = match_candidates(first_last(p[name_key]), index,
+                                              pos=p.get(pos_key) if pos_key else None,
+                                              team=p.get(team_key) if team_key else None,
+                                              fallback=fallback, interactive=interactive)
             match = fbd.get(match_name)
             if match and len(match) == 1:
                 mfl_players[idx]['fb_player_id'] = match[0]['fb_player_id']
@@ -183,15 +671,33 @@ class F4f(Site):
 
     '''
 
-    def __init__(self, db):
+    # team field of site players view, None if it has no team
+    team_column = None
+
+    # column of site players view whose max changes on update
+    # None checks row count only, so in-place updates are not seen
+    timestamp_column = None
+
+    # column of xref table whose max changes on update, None uses xref_checksum
+    xref_timestamp_column = None
+    # postgres hashtext, summed to detect in-place updates
+    xref_checksum = ("hashtext(CAST(mfl_player_id AS TEXT) || '_' || "
+                     "CAST(f4f_player_id AS TEXT))")
+
+    def __init__(self, db, max_age=60):
         '''
 
         Args:
             db(NFLPostgres): instance
+            max_age(float): seconds between checks for changed tables
 
         '''
         logging.getLogger(__name__).addHandler(logging.NullHandler())
         self.db = db
+        xref_checksum = None if self.xref_timestamp_column else self.xref_checksum
+        self._xref = snapshot(db, 'dfs.f4f_mfl_xref', self.xref_timestamp_column, max_age,
+                              xref_checksum)
+        self._players = snapshot(db, 'dfs.vw_f4f_players', self.timestamp_column, max_age)
 
     def add_xref(self, *players):
         '''
@@ -218,11 +724,10 @@ class F4f(Site):
             dict - mfl_player_id: fanball_id or vice versa
 
         '''
-        q = """SELECT mfl_player_id as m, f4f_player_id as f FROM dfs.f4f_mfl_xref"""
-        players = self.db.select_dict(q)
+        players = self._xref.rows()
         if first == 'mfl':
-            return {p['m']: p['f'] for p in players}
-        return {p['m']: p['f'] for p in players}
+            return {p['mfl_player_id']: p['f4f_player_id'] for p in players}
+        return {p['mfl_player_id']: p['f4f_player_id'] for p in players}
 
     def get_players(self):
         '''
@@ -232,37 +737,37 @@ class F4f(Site):
             list
 
         '''
-        q = """SELECT * FROM dfs.vw_f4f_players"""
-        return self.db.select_dict(q)
+        return list(self._players.rows())
 
     def get_playersd(self, key='name'):
         '''
         Gets MFL players from salary table
 
         Args:
-            key(str):
+            key(str): 'name', 'namepos' or 'id'
 
         Returns:
-            dict
+            FrozenIndex: read-only, key: tuple of dict
 
         '''
-        d = defaultdict(list)
-        q = """SELECT * FROM dfs.vw_f4f_players"""
         if key == 'name':
-            for p in self.db.select_dict(q):
-                d[p['source_player_name']].append(p)
+            d = self._players.index(key, lambda p: p['source_player_name'])
         elif key == 'namepos':
-            for p in self.db.select_dict(q):
-                k = '{}_{}'.format(p['source_player_name'], p['dfs_position'])
-                d[k].append(p)
+            d = self._players.index(
+                key, lambda p: '{}_{}'.format(p['source_player_name'], p['dfs_position']))
+        elif key == 'id':
+            d = self._players.index(key, lambda p: p['f4f_player_id'])
         else:
             raise ValueError('invalid key name: {}'.format(key))
         return d
 
     def match_mfl(self, mfl_players, id_key, name_key,
-                  pos_key=None, interactive=False):
+                  pos_key=None, interactive=False, team_key=None, fallback=True,
+                  batch=False):
         '''
         Matches mfl players to fanball players
+        Fuzzy matching only scores names that share a blocking key,
+        batch=True scores all unmatched players in one vectorized pass
 
         Args:
             mfl_players(list):
@@ -270,6 +775,9 @@ class F4f(Site):
             name_key(str):
             pos_key(str):
             interactive(bool):
+            team_key(str): mfl team field, used if site players have team
+            fallback(bool): score all site names when blocking finds nothing
+            batch(bool): use batch_match instead of blocking when not interactive
 
         Returns:
             list: of player
@@ -277,18 +785,36 @@ class F4f(Site):
         '''
         d = self.get_mfld(first='mfl')
         f4fd = self.get_playersd('name')
-        f4f_playernames = list(f4fd.keys())
+        index = BlockingIndex([p for players in f4fd.values() for p in players],
+                              team_key=self.team_column)
 
+        unmatched = []
         for idx, p in enumerate(mfl_players):
             # first option is to see if already in database
             if d.get(p[id_key]):
                 mfl_players[idx]['f4f_player_id'] = d[p[id_key]]
-                continue
+            else:
+                unmatched.append(idx)
+
+        use_batch = batch and not interactive
+        if use_batch:
+            qpos = [mfl_players[idx].get(pos_key) if pos_key else None for idx in unmatched]
+            npos = [next(iter(index.positions[n])) if len(index.positions[n]) == 1 else None
+                    for n in index.names]
+            match_names = batch_match([first_last(mfl_players[idx][name_key])
+                                       for idx in unmatched], index.names,
+                                      query_positions=qpos, name_positions=npos)
+        else:
+            match_names = [None] * len(unmatched)
 
+        for idx, match_name in zip(unmatched, match_names):
+            p = mfl_players[idx]
             # if not in database, use matcher
-            # player
-            match_name = player_match(first_last(p[name_key]), f4f_playernames, thresh=90,
-                                      interactive=interactive)
+            if not use_batch:
+                match_name = match_candidates(first_last(p[name_key]), index,
+                                              pos=p.get(pos_key) if pos_key else None,
+                                              team=p.get(team_key) if team_key else None,
+                                              fallback=fallback, interactive=interactive)
             match = f4fd.get(match_name)
             if match and len(match) == 1:
                 mfl_players[idx]['f4f_player_id'] = match[0]['f4f_player_id']
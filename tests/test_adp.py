@@ -0,0 +1,100 @@
+'''
+
+# tests/test_adp.py
+
+'''
+
+import datetime
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+from nflfantasy.adp import AdpHistory, DraftAdp
+
+
+class DraftAdp_test(unittest.TestCase):
+    '''
+    Tests adp analytics from mfl draft picks
+
+    '''
+
+    @staticmethod
+    def league(league_id, order, size):
+        return [{'league_id': league_id, 'round': '{:02d}'.format(i // size + 1),
+                 'pick': '{:02d}'.format(i % size + 1), 'player': pid}
+                for i, pid in enumerate(order)]
+
+    def setUp(self):
+        self.adp = DraftAdp()
+        self.adp.ingest(self.league(1, ['a', 'b', 'c', 'd'], 2), scoring='ppr')
+        self.adp.ingest(self.league(2, ['b', 'a', 'd', 'e'], 2), scoring='ppr')
+
+    def test_summary(self):
+        df = self.adp.summary().set_index('player_id')
+        self.assertEqual(df.loc['a', 'adp'], 1.5)
+        self.assertEqual(df.loc['a', 'stdev'], .5)
+        self.assertEqual(df.loc['c', 'pct_drafted'], .5)
+        self.assertEqual(df.loc['d', 'min_pick'], 3)
+        self.assertEqual(df.loc['d', 'max_pick'], 4)
+
+    def test_incremental(self):
+        self.assertEqual(self.adp.ingest(self.league(2, ['e', 'd', 'c', 'b'], 2)), 0)
+        self.assertEqual(self.adp.ingest(self.league(3, ['e', 'd', 'c', 'b', 'a', 'f'], 3),
+                                         scoring='ppr'), 1)
+        self.assertEqual(self.adp.slices, [(2, 'ppr'), (3, 'ppr')])
+        df = self.adp.summary(franchises=2).set_index('player_id')
+        self.assertEqual(df.loc['a', 'drafts'], 2)
+        self.assertEqual(self.adp.summary().set_index('player_id').loc['e', 'drafts'], 2)
+
+    def test_round_frequency(self):
+        df = self.adp.round_frequency(normalize=False)
+        self.assertEqual(list(df.columns), [1, 2])
+        self.assertEqual(df.loc['d', 2], 2)
+        self.assertEqual(self.adp.round_frequency().loc['c', 2], 1)
+
+
+class AdpHistory_test(unittest.TestCase):
+    '''
+    Tests delta-encoded adp snapshot history
+
+    '''
+
+    @staticmethod
+    def snapshot(adps):
+        return [{'id': pid, 'averagePick': str(adp), 'minPick': '1', 'maxPick': '20',
+                 'draftSelPct': '100'} for pid, adp in adps.items()]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = AdpHistory(os.path.join(self.tmp.name, 'adp.sqlite'))
+        self.day = datetime.date(2019, 8, 1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_history(self):
+        later = self.day + datetime.timedelta(days=7)
+        self.assertEqual(self.history.add_snapshot(self.snapshot({'a': 1.5, 'b': 9.0}),
+                                                   day=self.day), 2)
+        self.assertEqual(self.history.add_snapshot(self.snapshot({'a': 1.5, 'b': 6.0, 'c': 30}),
+                                                   day=later), 2)
+        self.assertIsNone(self.history.add_snapshot(self.snapshot({'a': 2}), day=later))
+        self.assertEqual(list(self.history.trajectory('b')['adp']), [9.0, 6.0])
+        self.assertEqual(len(self.history.trajectory('a')), 1)
+        movers = self.history.movers(days=7)
+        self.assertEqual(list(movers.index), ['b', 'a'])
+        self.assertEqual(movers.loc['b', 'change'], 3)
+
+    def test_removed(self):
+        self.history.add_snapshot(self.snapshot({'a': 1.5, 'b': 9.0}), day=self.day)
+        later = self.day + datetime.timedelta(days=1)
+        self.assertEqual(self.history.add_snapshot(self.snapshot({'a': 1.5}), day=later), 1)
+        self.assertEqual(list(self.history.as_of(later).index), ['a'])
+        self.assertEqual(len(self.history.as_of(self.day)), 2)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,58 @@
+'''
+
+# tests/test_distributions.py
+
+'''
+
+import logging
+import sys
+import unittest
+
+import numpy as np
+
+from nflfantasy.distributions import PlayerDistributions
+
+
+class PlayerDistributions_test(unittest.TestCase):
+    '''
+    Tests player distributions fit from fantasymath quantiles
+
+    '''
+
+    @staticmethod
+    def dist(name, mu, sigma):
+        z = {'p5': -1.645, 'p25': -.674, 'p50': 0, 'p75': .674, 'p95': 1.645}
+        d = {k: mu + v * sigma for k, v in z.items()}
+        d.update({'name': name, 'std': sigma})
+        return d
+
+    def setUp(self):
+        self.pd = PlayerDistributions.from_distributions(
+            [self.dist('a', 10, 5), self.dist('b', 12, 5), self.dist('c', 20, 2)])
+
+    def test_prob_matrix(self):
+        p = self.pd.prob_matrix()
+        self.assertEqual(p.shape, (3, 3))
+        self.assertTrue(np.allclose(p + p.T, 1))
+        self.assertTrue(np.allclose(np.diag(p), .5))
+        self.assertGreater(p[1, 0], .55)
+        self.assertGreater(p[2, 0], .9)
+
+    def test_sample(self):
+        s = self.pd.sample(50000, rng=np.random.default_rng(0))
+        self.assertTrue(np.allclose(s.mean(axis=0), self.pd.mean(), atol=.2))
+        p = self.pd.prob_matrix()
+        self.assertAlmostEqual((s[:, 1] > s[:, 0]).mean(), p[1, 0], places=2)
+
+    def test_best_prob(self):
+        p = self.pd.best_prob()
+        self.assertAlmostEqual(p.sum(), 1)
+        self.assertEqual(p.argmax(), 2)
+        sub = self.pd.subset(['b', 'a'])
+        self.assertEqual(sub.names, ['b', 'a'])
+        self.assertGreater(sub.best_prob()[0], .5)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    unittest.main()
@@ -5,11 +5,14 @@
 '''
 
 import logging
+import os
 import random
 import sys
+import tempfile
 import unittest
+from unittest import mock
 
-from nflfantasy.fantasymath import Scraper, Parser
+from nflfantasy.fantasymath import Scraper, Parser, Agent, DistributionCache, PlayerState
 
 
 class fantasymath_test(unittest.TestCase):
@@ -42,6 +45,72 @@ class fantasymath_test(unittest.TestCase):
         self.assertIsNotNone(dist)
         self.assertIsInstance(dist, list)
 
+    def test_batches(self):
+        codes = ['a', 'b', 'c', 'a', 'd']
+        self.assertEqual(Agent.batches(codes, 3), [['a', 'b', 'c'], ['d']])
+
+    def test_distribution_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = DistributionCache(os.path.join(d, 'dist.sqlite'))
+            params = Scraper.scoring_params()
+            content = {'players': [{'name': 'Matt Ryan'}, {'name': 'Andy Dalton'}]}
+            cache.set(['matt-ryan', 'andy-dalton'], params, content)
+            self.assertEqual(cache.get_batch(['matt-ryan', 'andy-dalton'], params), content)
+            # reordered request gets players in its own order
+            hit = cache.get_batch(['andy-dalton', 'matt-ryan'], params)
+            self.assertEqual(hit['players'], [{'name': 'Andy Dalton'}, {'name': 'Matt Ryan'}])
+            self.assertIsNone(cache.get_batch(['matt-ryan'], params))
+            players = cache.get_players(['matt-ryan', 'travis-kelce'], params)
+            self.assertEqual(players, {'matt-ryan': {'name': 'Matt Ryan'}})
+            other = Scraper.scoring_params(scoring='std')
+            self.assertEqual(cache.get_players(['matt-ryan'], other), {})
+
+    def test_distributions_refetch(self):
+        def fetch(scraper, codes, params):
+            return {'players': [{'name': code, 'p50': 2} for code in codes]}
+
+        with tempfile.TemporaryDirectory() as d:
+            a = Agent(cache_name=os.path.join(d, 'fm'))
+            params = Scraper.scoring_params()
+            a._s.dist_cache.set(['a', 'b'], params,
+                                {'players': [{'name': 'a', 'p50': 1}, {'name': 'b', 'p50': 1}]})
+            with mock.patch.object(Scraper, '_distribution', fetch):
+                dists = a.distributions(['a', 'b', 'c'], rate=100, refetch=['b'])
+            self.assertEqual({k: v['p50'] for k, v in dists.items()}, {'a': 1, 'b': 2, 'c': 2})
+            # refetched player also refreshes cache
+            self.assertEqual(a._s.dist_cache.get_players(['b'], params)['b']['p50'], 2)
+
+    def test_refresh_projections(self):
+        def fetch(scraper, codes, params):
+            return {'players': [{'name': code, 'p50': 2} for code in codes]}
+
+        players = {c: {'id': c, 'pos': 'QB', 'name': c} for c in ['a', 'b']}
+        with tempfile.TemporaryDirectory() as d:
+            a = Agent(cache_name=os.path.join(d, 'fm'))
+            a._s.dist_cache.set(['a'], Scraper.scoring_params(),
+                                {'players': [{'name': 'a', 'p50': 1}]})
+            with mock.patch.object(Scraper, '_distribution', fetch), \
+                    mock.patch.object(Scraper, 'players', lambda scraper: {}), \
+                    mock.patch.object(Parser, 'players', lambda parser, content: players):
+                dists = a.refresh_projections(os.path.join(d, 'state.json'), rate=100)
+            # new player is fetched even though dist_cache has it
+            self.assertEqual({k: v['p50'] for k, v in dists.items()}, {'a': 2, 'b': 2})
+
+    def test_player_state(self):
+        players = {c: {'id': c, 'pos': 'QB', 'name': c} for c in ['a', 'b', 'c']}
+        state = PlayerState()
+        self.assertEqual(state.diff(players)['new'], ['a', 'b', 'c'])
+        state.update(players, {c: {'p50': 1} for c in players})
+        self.assertEqual(state.diff(players), {'new': [], 'returned': [], 'changed': [],
+                                               'stale': [], 'removed': []})
+        state.update({'b': players['b']}, {})
+        players['b'] = {'id': 'b', 'pos': 'RB', 'name': 'b'}
+        diff = state.diff(players)
+        self.assertEqual(diff['returned'], ['a', 'c'])
+        self.assertEqual(diff['changed'], ['b'])
+        self.assertEqual(state.diff(players, max_age_hours=0)['stale'], [])
+        self.assertEqual(state.update(players, {'a': {'p50': 1}, 'b': {'p50': 2}}), ['b'])
+
 
 if __name__=='__main__':
     logging.basicConfig(stream=sys.stdout, level=logging.INFO)
@@ -2,12 +2,84 @@
 
 from __future__ import absolute_import, print_function, division
 
+import json
 import logging
+import os
 import random
 import sys
+import tempfile
 import unittest
 
-from nflfantasy.mfl import Scraper
+from nflfantasy.mfl import (DraftHarvester, DraftTracker, JsonLinesSink, Scraper, Parser,
+                            PlayerMaster, PlayerRegistry, iter_json_array)
+
+
+def draft_content(*players):
+    picks = [{'round': '01', 'pick': '{:02d}'.format(i + 1), 'player': player,
+              'franchise': '{:04d}'.format(i + 1)} for i, player in enumerate(players)]
+    return json.dumps({'draftResults': {'draftUnit': {'draftPick': picks}}}).encode()
+
+
+class FakeResponse():
+
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise ValueError(self.status_code)
+
+
+class FakeSession():
+    '''
+    Returns queued responses, records request headers
+
+    '''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+class FakeScraper():
+    '''
+    Returns queued players responses, records since
+
+    '''
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.since = []
+
+    def players(self, season_year, since=None, details=1):
+        self.since.append(since)
+        return self.contents.pop(0)
+
+
+class FakeDraftScraper():
+    '''
+    Draft results by league: 1 has picks, 2 fails once, 3 is empty,
+    4 always fails, 5 is an error document
+
+    '''
+
+    def __init__(self):
+        self.calls = []
+
+    def draft_results(self, season_year, league_id):
+        self.calls.append(league_id)
+        if league_id == 4 or (league_id == 2 and self.calls.count(2) == 1):
+            raise ValueError('timed out')
+        if league_id == 5:
+            return {'error': {'$t': 'Invalid league'}}
+        players = ['13604', ''] if league_id in (1, 2) else ['']
+        return json.loads(draft_content(*players))
 
 
 class MFL_test(unittest.TestCase):
@@ -18,6 +90,7 @@ class MFL_test(unittest.TestCase):
 
     def setUp(self):
         self.s = Scraper()
+        self.p = Parser()
 
     def test_players(self):
         content = self.s.players(self.season)
@@ -31,6 +104,144 @@ class MFL_test(unittest.TestCase):
         content = self.s.draft_results(season_year=2019, league_id=49176)
         self.assertIsNotNone(content)
 
+    def test_draft_picks(self):
+        content = {'draftResults': {'draftUnit': {'draftPick': [
+            {'round': '01', 'pick': '01', 'player': '13604', 'franchise': '0001'},
+            {'round': '01', 'pick': '02', 'player': '', 'franchise': '0002'}]}}}
+        picks = self.p.draft_picks(content, league_id=49176)
+        self.assertEqual(len(picks), 1)
+        self.assertEqual(picks[0]['league_id'], 49176)
+        self.assertEqual(len(self.p.draft_picks(content, made_only=False)), 2)
+
+    def test_draft_tracker(self):
+        session = FakeSession(
+            FakeResponse(content=draft_content('13604', ''), headers={'ETag': 'a'}),
+            FakeResponse(304),
+            FakeResponse(content=draft_content('13604', '')),
+            FakeResponse(content=draft_content('13604', '')),
+            FakeResponse(content=draft_content('13604', '12625')))
+        tracker = DraftTracker(2019, 49176, min_interval=1, max_interval=2, backoff=1.5,
+                               session=session)
+        seen = []
+        tracker.subscribe(seen.append)
+        self.assertEqual([p['player'] for p in tracker.poll()], ['13604'])
+        self.assertEqual(tracker.interval, 1)
+        self.assertFalse(tracker.complete)
+
+        # not modified, then same content: no picks and interval backs off to max
+        self.assertEqual(tracker.poll(), [])
+        self.assertEqual(session.headers[1], {'If-None-Match': 'a'})
+        self.assertEqual(tracker.interval, 1.5)
+        self.assertEqual(tracker.poll(), [])
+        self.assertEqual(tracker.interval, 2)
+        self.assertEqual(tracker.poll(), [])
+        self.assertEqual(tracker.interval, 2)
+
+        # new pick resets interval and completes draft
+        self.assertEqual([p['player'] for p in tracker.poll()], ['12625'])
+        self.assertEqual(tracker.interval, 1)
+        self.assertTrue(tracker.complete)
+        self.assertEqual([p['player'] for p in seen], ['13604', '12625'])
+        self.assertEqual(tracker.run(), 2)
+
+    def test_draft_tracker_units(self):
+        def unit(name, *players):
+            content = json.loads(draft_content(*players))
+            return dict(content['draftResults']['draftUnit'], unit=name)
+
+        def content(*units):
+            return json.dumps({'draftResults': {'draftUnit': list(units)}}).encode()
+
+        session = FakeSession(
+            FakeResponse(content=content(unit('DIVISION00', '13604'),
+                                         unit('DIVISION01', '12625', ''))),
+            FakeResponse(content=content(unit('DIVISION00', '13604'),
+                                         unit('DIVISION01', '12625', '13116'))))
+        tracker = DraftTracker(2019, 49176, session=session)
+        new = tracker.poll()
+        self.assertEqual([(p['unit'], p['player']) for p in new],
+                         [('DIVISION00', '13604'), ('DIVISION01', '12625')])
+        self.assertFalse(tracker.complete)
+        self.assertEqual([p['player'] for p in tracker.poll()], ['13116'])
+        self.assertTrue(tracker.complete)
+
+    def test_draft_harvester(self):
+        scraper = FakeDraftScraper()
+        harvester = DraftHarvester(2019, scraper=scraper, concurrency=2, rate=1000,
+                                   retries=1, backoff=0)
+        with tempfile.TemporaryDirectory() as d:
+            sink = JsonLinesSink(os.path.join(d, 'picks.jsonl'))
+            stats = harvester.run([1, 2, 3, 4, 5], sink)
+            self.assertEqual(stats, {'leagues': 4, 'picks': 2, 'empty': 2, 'failed': 1})
+            self.assertEqual(sorted(scraper.calls), [1, 2, 2, 3, 4, 4, 5])
+            self.assertEqual(sink.leagues(), {1, 2, 3, 5})
+            self.assertEqual(sorted(p['league_id'] for p in sink.picks()), [1, 2])
+
+            # rerun only fetches the failed league
+            scraper.calls = []
+            stats = harvester.run([1, 2, 3, 4, 5], sink)
+            self.assertEqual(scraper.calls, [4, 4])
+            self.assertEqual(stats['failed'], 1)
+            harvester.run([3], sink, skip_done=False)
+            self.assertEqual(scraper.calls, [4, 4, 3])
+
+    def test_player_master(self):
+        full = {'players': {'player': [
+            {'id': '13604', 'name': 'Barkley, Saquon', 'position': 'RB', 'team': 'NYG'},
+            {'id': '12625', 'name': 'Bell, Le\'Veon', 'position': 'RB', 'team': 'PIT'}]}}
+        delta = {'players': {'player':
+            {'id': '12625', 'name': 'Bell, Le\'Veon', 'position': 'RB', 'team': 'NYJ'}}}
+        scraper = FakeScraper(full, delta)
+        with tempfile.TemporaryDirectory() as d:
+            master = PlayerMaster(os.path.join(d, 'players.sqlite'), 2019)
+            self.assertIsNone(master.watermark)
+            self.assertEqual(master.sync(scraper), 2)
+            watermark = master.watermark
+            self.assertIsNotNone(watermark)
+            self.assertEqual(master.sync(scraper), 1)
+            self.assertEqual(scraper.since, [None, watermark])
+            self.assertGreaterEqual(master.watermark, watermark)
+            self.assertEqual(len(master), 2)
+            self.assertEqual(master.get(12625)['team'], 'NYJ')
+            self.assertEqual([p['id'] for p in master.players(team='NYG')], ['13604'])
+            self.assertIsNone(master.get('0'))
+
+    def test_adp_panel(self):
+        results = {
+            (12, 1): {'adp': {'totalDrafts': '50', 'player': [
+                {'id': '13604', 'rank': '1', 'averagePick': '1.40', 'minPick': '1',
+                 'maxPick': '3', 'draftSelPct': '100', 'draftsSelectedIn': '50'},
+                {'id': '12625', 'rank': '2', 'averagePick': '2.10', 'minPick': '1',
+                 'maxPick': '4', 'draftSelPct': '100', 'draftsSelectedIn': '50'}]}},
+            (10, 0): {'adp': {'totalDrafts': '20', 'player':
+                {'id': '13604', 'rank': '1', 'averagePick': '1.20', 'minPick': '1',
+                 'maxPick': '2', 'draftSelPct': '100', 'draftsSelectedIn': '20'}}}}
+        df = self.p.adp_panel(results)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(list(df.index.names), ['player_id', 'franchises', 'ppr'])
+        self.assertAlmostEqual(df.loc[('13604', 10, 0), 'adp'], 1.2)
+        self.assertEqual(df.loc[('12625', 12, 1), 'total_drafts'], 50)
+        self.assertTrue(self.p.adp_panel({}).empty)
+
+    def test_player_registry(self):
+        reg = PlayerRegistry([{'id': '9099', 'name': 'Beckham Jr., Odell', 'position': 'WR', 'team': 'NYG'},
+                              {'id': '5848', 'name': 'Brady, Tom', 'position': 'QB', 'team': 'NEP'}])
+        self.assertEqual(len(reg), 2)
+        self.assertEqual(reg.get(9099).name, 'Beckham Jr., Odell')
+        self.assertEqual(reg.by_name('Odell Beckham')[0].id, '9099')
+        self.assertEqual(reg.by_name('Tom Brady', position='WR'), [])
+        reg.add({'id': '5848', 'name': 'Brady, Tom', 'position': 'QB', 'team': 'TBB'})
+        self.assertEqual(reg.by_team('NEP'), [])
+        self.assertEqual([p.id for p in reg.by_position('QB')], ['5848'])
+
+    def test_iter_json_array(self):
+        players = [{'id': str(i), 'name': 'Last, First [{}]'.format(i)} for i in range(50)]
+        text = json.dumps({'players': {'timestamp': '1', 'player': players}})
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        self.assertEqual(list(iter_json_array(chunks, 'player')), players)
+        text = json.dumps({'draftResults': {'draftUnit': {'draftPick': {'player': '1'}}}})
+        self.assertEqual(list(iter_json_array([text], 'draftPick')), [{'player': '1'}])
+
     def test_league(self):
         content = self.s.league(season_year=2019, league_id=49176)
         self.assertIsNotNone(content)
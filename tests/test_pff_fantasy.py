@@ -0,0 +1,148 @@
+'''
+
+# tests/test_pff_fantasy.py
+
+'''
+
+import copy
+import logging
+import sys
+import unittest
+
+from nflfantasy.pff_fantasy import ConsensusEngine, Parser
+
+
+BESTBALL = {
+    'ranking_type': {'path': 'nfl-best-ball', 'season': 2019,
+                     'allowed_positions': ['qb', 'rb', 'wr', 'te']},
+    'rankers': [{'id': 1, 'name': 'Ranker A'}, {'id': 2, 'name': 'Ranker B'},
+                {'id': 3, 'name': 'Ranker C'}, {'id': 4, 'name': 'Ranker D'}],
+    'players': [{'player_id': 10, 'first_name': 'Saquon', 'last_name': 'Barkley'},
+                {'player_id': 11, 'first_name': 'Christian', 'last_name': 'McCaffrey'},
+                {'player_id': 12, 'first_name': 'Patrick', 'last_name': 'Mahomes'}],
+    'position_rankings': [
+        {'position': 'overall', 'player_rankings': [
+            {'player_id': 10, 'ranks': [{'ranker_id': 1, 'rank': 1}, {'ranker_id': 2, 'rank': 2},
+                                        {'ranker_id': 3, 'rank': 1}, {'ranker_id': 4, 'rank': 6}]},
+            {'player_id': 11, 'ranks': [{'ranker_id': 1, 'rank': 2}, {'ranker_id': 2, 'rank': 1},
+                                        {'ranker_id': 3, 'rank': 3}, {'ranker_id': 4, 'rank': 1}]},
+            {'player_id': 12, 'ranks': [{'ranker_id': 1, 'rank': 30}, {'ranker_id': 3, 'rank': 24}]}]},
+        {'position': 'rb', 'player_rankings': [
+            {'player_id': 10, 'ranks': [{'ranker_id': 1, 'rank': 1}]},
+            {'player_id': 11, 'ranks': [{'ranker_id': 1, 'rank': 2}]}]},
+        {'position': 'qb', 'player_rankings': [
+            {'player_id': 12, 'ranks': [{'ranker_id': 1, 'rank': 1}]}]}]}
+
+WEEKLY = {
+    1: [{'player_id': 10, 'player_name': 'Saquon Barkley', 'position': 'rb', 'week': 1,
+         'fantasy_points': 20.5, 'rush_yds': 90},
+        {'player_id': 12, 'player_name': 'Patrick Mahomes', 'position': 'qb', 'week': 1,
+         'fantasy_points': 25.0, 'rush_yds': 20}],
+    2: [{'player_id': 10, 'player_name': 'Saquon Barkley', 'position': 'rb', 'week': 2,
+         'fantasy_points': 18.0, 'rush_yds': 80}],
+    3: [{'player_id': 10, 'player_name': 'Saquon Barkley', 'position': 'rb', 'week': 3,
+         'fantasy_points': 22.0, 'rush_yds': 100},
+        {'player_id': 12, 'player_name': 'Patrick Mahomes', 'position': 'qb', 'week': 3,
+         'fantasy_points': 21.0, 'rush_yds': 15}]}
+
+
+class PFF_fantasy_test(unittest.TestCase):
+    '''
+    Tests pff parser
+
+    '''
+
+    def setUp(self):
+        self.p = Parser()
+
+    def test_bestball_matrix(self):
+        m = self.p.bestball_matrix(BESTBALL)
+        self.assertEqual(m.ranks.shape, (3, 4))
+        self.assertEqual(list(m.count()), [4, 4, 2])
+        self.assertEqual(list(m.mean()), [2.5, 1.75, 27])
+        self.assertEqual(list(m.pff_avg()), [1.5, 1.5, 27])
+        self.assertEqual(list(m.median()), [1.5, 1.5, 27])
+        board = m.board()
+        self.assertEqual(board[2]['plyr'], 'Patrick Mahomes')
+        self.assertEqual(board[2]['ranks'], [24, 30])
+        self.assertEqual(board[0]['pos'], 'RB')
+        self.assertEqual(m.board('mean')[0]['player_id'], 11)
+
+    def test_bestball_rankings_avg(self):
+        avgs = {p['player_id']: p['avg'] for p in self.p.bestball_rankings(BESTBALL)}
+        self.assertEqual(avgs, {10: 1.5, 11: 1.5, 12: 27})
+        board = self.p.bestball_matrix(BESTBALL).board()
+        self.assertEqual({p['player_id']: p['avg'] for p in board}, avgs)
+
+    def test_bestball_rankings_long(self):
+        rows = list(self.p.bestball_rankings_long(BESTBALL))
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[0].source_player_name, 'Saquon Barkley')
+        self.assertEqual(rows[0].source_ranker_name, 'Ranker A')
+        self.assertIs(rows[0].source_ranking_type, rows[-1].source_ranking_type)
+        df = self.p.bestball_rankings_frame(BESTBALL)
+        self.assertEqual(len(df), 13)
+        self.assertEqual(str(df['source_player_position'].dtype), 'category')
+        self.assertEqual(df['source_player_rank'].sum(), sum(r.source_player_rank for r in rows))
+
+    def test_projection_cube(self):
+        cube = self.p.projection_cube(WEEKLY)
+        self.assertEqual(cube.values.shape, (2, 3, 2))
+        self.assertEqual(cube.stats, ['fantasy_points', 'rush_yds'])
+        self.assertEqual(cube.players[12]['position'], 'qb')
+        season = cube.season('fantasy_points')
+        self.assertAlmostEqual(season.loc[10, 'fantasy_points'], 60.5)
+        self.assertAlmostEqual(season.loc[12, 'fantasy_points'], 46.0)
+        ros = cube.rest_of_season(2)
+        self.assertEqual(ros.loc[10, 'rush_yds'], 180)
+        self.assertEqual(ros.loc[12, 'rush_yds'], 15)
+        deltas = cube.deltas('fantasy_points')
+        self.assertEqual(list(deltas.columns), [2, 3])
+        self.assertAlmostEqual(deltas.loc[10, 2], -2.5)
+        self.assertTrue(deltas.loc[12].isna().all())
+
+    def test_consensus_engine(self):
+        engine = ConsensusEngine()
+        changes = engine.refresh(self.p.bestball_matrix(BESTBALL))
+        self.assertEqual(changes, [(10, None, 1.5), (11, None, 1.5), (12, None, 27)])
+        self.assertEqual(engine.refresh(self.p.bestball_matrix(BESTBALL)), [])
+
+        content = copy.deepcopy(BESTBALL)
+        ranks = content['position_rankings'][0]['player_rankings'][2]['ranks']
+        ranks[0]['rank'] = 20
+        changes = engine.refresh(self.p.bestball_matrix(content))
+        self.assertEqual(changes, [(12, 27, 22)])
+        m = self.p.bestball_matrix(content)
+        self.assertEqual([engine.consensus[pid] for pid in m.player_ids], list(m.pff_avg()))
+
+    def test_consensus_engine_incremental(self):
+        engine = ConsensusEngine(rule='mean')
+        engine.refresh(self.p.bestball_matrix(BESTBALL))
+        content = copy.deepcopy(BESTBALL)
+        content['position_rankings'][0]['player_rankings'][0]['ranks'][3]['rank'] = 2
+        added = []
+        add = engine._add
+        engine._add = lambda pid, rank: added.append(pid) or add(pid, rank)
+        self.assertEqual(engine.refresh(self.p.bestball_matrix(content)), [(10, 2.5, 1.5)])
+        # only the one changed cell is applied
+        self.assertEqual(added, [10])
+
+        # ranker and player dropped from board
+        content['rankers'] = content['rankers'][:3]
+        overall = content['position_rankings'][0]['player_rankings']
+        del overall[2]
+        for prkg in overall:
+            prkg['ranks'] = [r for r in prkg['ranks'] if r['ranker_id'] != 4]
+        changes = engine.refresh(self.p.bestball_matrix(content))
+        self.assertEqual(changes, [(10, 1.5, 4 / 3), (11, 1.75, 2), (12, 27, None)])
+        self.assertEqual(set(engine.columns), {1, 2, 3})
+
+        # apply between refreshes stays consistent
+        engine.apply(1, {10: 5.0, 11: 2.0})
+        changes = engine.refresh(self.p.bestball_matrix(content))
+        self.assertEqual(changes, [(10, 8 / 3, 4 / 3)])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    unittest.main()
@@ -1,11 +1,22 @@
 # tests/test_rg.py
 
+import json
 import logging
+import os
 import random
 import sys
+import tempfile
 import unittest
+from unittest import mock
 
-from nflfantasy.rotoguru import Scraper, Parser
+from nflfantasy.rotoguru import Agent, Scraper, Parser, DfsStore
+
+
+SSV = """<html><body><pre>
+Week;Year;GID;Name;Pos;Team;h/a;Oppt;DK points;DK salary
+1;2016;1234;Brady, Tom;QB;nwe;a;ari;21.5;7300
+1;2016;5678;Beckham Jr., Odell;WR;nyg;h;dal;14.2;$8,600
+</pre></body></html>"""
 
 
 class RotoguruNFL_test(unittest.TestCase):
@@ -33,6 +44,72 @@ class RotoguruNFL_test(unittest.TestCase):
         results = self.p.dfs_week(content)
         self.assertIsNotNone(results)
 
+    def test_dfs_week_iter(self):
+        rows = list(self.p.dfs_week_iter(SSV))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['name'], 'Brady, Tom')
+        self.assertEqual(rows[0]['year'], 2016)
+        self.assertEqual(rows[1]['dk_salary'], 8600)
+        self.assertAlmostEqual(rows[1]['dk_points'], 14.2)
+        self.assertEqual(self.p.dfs_week(SSV)[0]['dk_points'], '21.5')
+
+    def test_dfs_week_frame(self):
+        df = self.p.dfs_week_frame(SSV)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df['salary'].sum(), 15900)
+        self.assertEqual(str(df['pos'].dtype), 'category')
+        self.assertEqual(list(df['site'].unique()), ['dk'])
+
+    def test_dfs_store(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = DfsStore(root)
+            df = self.p.dfs_week_frame(SSV)
+            self.assertEqual(store.append(df), [(2016, 1, 'dk')])
+            store.append(df)
+            self.assertEqual(store.partitions(), {(2016, 1, 'dk')})
+            self.assertEqual(len(store.read()), 2)
+            self.assertEqual(len(store.read(seasons=[2015])), 0)
+            qbs = store.read(sites=['dk'], positions=['QB'], max_salary=8000)
+            self.assertEqual(list(qbs['name']), ['Brady, Tom'])
+
+    def test_dfs_store_temp_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = DfsStore(root)
+            store.append(self.p.dfs_week_frame(SSV))
+            path = os.path.join(root, 'season=2016', 'week=1', 'site=dk')
+            # leftover from interrupted write
+            with open(os.path.join(path, '.part-0.parquet.tmp'), 'wb') as f:
+                f.write(b'PAR1')
+            self.assertEqual(len(store.read()), 2)
+            store.append(self.p.dfs_week_frame(SSV))
+            self.assertEqual(os.listdir(path), ['part-0.parquet'])
+
+    def test_dfs_backfill(self):
+        def dfs_week(scraper, season_year, week, site):
+            return SSV if week == 1 else '<html><pre></pre></html>'
+
+        with tempfile.TemporaryDirectory() as d, \
+                mock.patch.object(Scraper, 'dfs_week', dfs_week):
+            manifest = os.path.join(d, 'manifest.jsonl')
+            a = Agent(cache_name=os.path.join(d, 'test-rg-agent'))
+            results = a.dfs_backfill([2016], [1, 2], ['dk'], manifest, min_interval=0)
+            self.assertEqual(list(results), [(2016, 1, 'dk')])
+            self.assertEqual(len(results[(2016, 1, 'dk')]), 2)
+            with open(manifest) as f:
+                self.assertEqual([json.loads(line)['week'] for line in f], [1])
+
+            # done week is skipped, empty week is fetched again and goes to sink
+            sunk = []
+            results = a.dfs_backfill([2016], [1, 2], ['dk'], manifest, min_interval=0,
+                                     sink=lambda *args: sunk.append(args))
+            self.assertEqual(results, {})
+            self.assertEqual(sunk, [])
+            with mock.patch.object(Scraper, 'dfs_week', lambda *args: SSV):
+                a.dfs_backfill([2016], [1, 2], ['dk'], manifest, min_interval=0,
+                               sink=lambda *args: sunk.append(args))
+            self.assertEqual([args[:3] for args in sunk], [(2016, 2, 'dk')])
+            self.assertEqual(len(sunk[0][3]), 2)
+
 
 if __name__=='__main__':
     logging.basicConfig(stream=sys.stdout, level=logging.INFO)
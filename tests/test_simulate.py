@@ -0,0 +1,52 @@
+'''
+
+# tests/test_simulate.py
+
+'''
+
+import logging
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from nflfantasy.distributions import PlayerDistributions
+from nflfantasy.simulate import LineupSimulator
+
+
+class LineupSimulator_test(unittest.TestCase):
+    '''
+    Tests monte carlo lineup simulator
+
+    '''
+
+    def setUp(self):
+        # normal quantiles at PlayerDistributions.probs, all players have std 6
+        z = np.array([-3.090, -1.645, -.674, 0, .674, 1.645, 3.090])
+        mu = np.array([20, 14, 18, 12])
+        self.dists = PlayerDistributions(['qb1', 'wr1', 'qb2', 'wr2'],
+                                         mu[:, None] + 6 * z[None, :])
+        self.lineups = {'a': ['qb1', 'wr1'], 'b': ['qb2', 'wr2']}
+
+    def test_simulate(self):
+        sim = LineupSimulator(self.dists, self.lineups)
+        df = sim.simulate(20000, matchups=[('a', 'b')], chunk_size=5000, processes=2, seed=1)
+        self.assertEqual(list(df.index), ['a', 'b'])
+        self.assertAlmostEqual(df.loc['a', 'expected'], 34, delta=.5)
+        self.assertAlmostEqual(df.loc['a', 'win_prob'] + df.loc['b', 'win_prob'], 1)
+        self.assertGreater(df.loc['a', 'win_prob'], .6)
+        self.assertTrue((df['p5'] < df['p50']).all())
+
+    def test_correlation(self):
+        names = self.dists.names
+        corr = pd.DataFrame(np.eye(len(names)), index=names, columns=names)
+        corr.loc['qb1', 'wr1'] = corr.loc['wr1', 'qb1'] = .8
+        indep = LineupSimulator(self.dists, self.lineups).scores(20000, processes=1, seed=1)
+        stack = LineupSimulator(self.dists, self.lineups, corr).scores(20000, processes=1, seed=1)
+        self.assertGreater(stack[:, 0].std(), indep[:, 0].std() * 1.15)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    unittest.main()
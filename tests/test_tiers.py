@@ -0,0 +1,60 @@
+'''
+
+# tests/test_tiers.py
+
+'''
+
+import itertools
+import logging
+import sys
+import unittest
+
+import numpy as np
+
+from nflfantasy.tiers import optimal_breaks, tier_frame, tiers
+
+
+class Tiers_test(unittest.TestCase):
+    '''
+    Tests optimal 1-D tiering
+
+    '''
+
+    @staticmethod
+    def _brute_sse(x, k):
+        x = np.sort(x)
+        best = np.inf
+        for cuts in itertools.combinations(range(1, len(x)), k - 1):
+            parts = np.split(x, cuts)
+            best = min(best, sum(((p - p.mean()) ** 2).sum() for p in parts))
+        return best
+
+    def test_optimal_breaks(self):
+        labels, sse = optimal_breaks([1, 1.5, 2, 10, 11, 12, 30], 3)
+        self.assertEqual(list(labels), [1, 1, 1, 2, 2, 2, 3])
+        self.assertAlmostEqual(sse[-1], 2.5)
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            x = rng.normal(size=9) * 10
+            for k in (2, 3, 4):
+                _, sse = optimal_breaks(x, k)
+                self.assertAlmostEqual(sse[-1], self._brute_sse(x, k))
+
+    def test_tiers_missing(self):
+        labels = tiers([5, None, 1, 'NA', 6], 2)
+        self.assertEqual(list(labels), [2, 0, 1, 0, 2])
+        self.assertEqual(list(tiers([3, 3, 3], 5)), [1, 1, 1])
+
+    def test_tier_frame(self):
+        board = [{'plyr': 'a', 'pos': 'RB', 'avg': 1.5}, {'plyr': 'b', 'pos': 'RB', 'avg': 2},
+                 {'plyr': 'c', 'pos': 'RB', 'avg': 9}, {'plyr': 'd', 'pos': 'QB', 'avg': 20},
+                 {'plyr': 'e', 'pos': 'QB', 'avg': 40}]
+        df = tier_frame(board, 'avg', 2, by='pos')
+        self.assertEqual(list(df['tier']), [1, 1, 2, 1, 2])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    unittest.main()
@@ -3,8 +3,10 @@
 # tests for nfl.xref module
 
 import logging
+import sqlite3
 import sys
 import unittest
+import zlib
 
 import nflfantasy.xref as nx
 from nflmisc.nflpg import getdb
@@ -72,6 +74,125 @@ class Xref_test(unittest.TestCase):
             self.pff.get_playersd('ERR')
 
 
+class BlockingIndex_test(unittest.TestCase):
+
+    def setUp(self):
+        players = [{'source_player_name': n, 'dfs_position': pos} for n, pos in
+                   [('Odell Beckham Jr.', 'WR'), ('Saquon Barkley', 'RB'),
+                    ("Le'Veon Bell", 'RB'), ('Kenny Bell', 'WR')]]
+        self.index = nx.BlockingIndex(players)
+
+    def test_soundex(self):
+        self.assertEqual(nx.soundex('Robert'), 'R163')
+        self.assertEqual(nx.soundex('Ashcraft'), 'A261')
+        self.assertEqual(nx.soundex('Tymczak'), 'T522')
+
+    def test_candidates(self):
+        self.assertEqual(self.index.candidates('Odell Beckham'), ['Odell Beckham Jr.'])
+        self.assertEqual(self.index.candidates('Leveon Bell'), ["Le'Veon Bell", 'Kenny Bell'])
+        self.assertEqual(self.index.candidates('Leveon Bell', 'RB'), ["Le'Veon Bell"])
+        self.assertEqual(self.index.candidates('Patrick Mahomes'), [])
+
+    def test_match_candidates(self):
+        self.assertIsNone(nx.match_candidates('Patrick Mahomes', self.index, fallback=False))
+
+    def test_batch_match(self):
+        names = ['Odell Beckham Jr.', "Le'Veon Bell", 'Kenny Bell', 'Kenny Belle']
+        matched = nx.batch_match(['Odell Beckham', 'Leveon Bell', 'Kenny Bell', 'Tom Brady'],
+                                 names, backend='bigram')
+        self.assertEqual(matched, ['Odell Beckham Jr.', "Le'Veon Bell", 'Kenny Bell', None])
+        self.assertEqual(nx.batch_match(['Kenny Bell'], names, margin=50, backend='bigram'),
+                         [None])
+        self.assertEqual(nx.batch_match(['Kenny Bell'] * 4, names, backend='bigram',
+                                        processes=2, chunk_size=2), ['Kenny Bell'] * 4)
+        self.assertEqual(nx.batch_match(['Mitch Trubisky', 'Chris Herndon'],
+                                        ['Mitchell Trubisky', 'Christopher Herndon'],
+                                        backend='bigram'),
+                         ['Mitchell Trubisky', 'Christopher Herndon'])
+        self.assertEqual(nx.batch_match(['Kenny Bell'], names, backend='bigram',
+                                        query_positions=['RB'],
+                                        name_positions=['WR', 'RB', 'WR', 'WR']), [None])
+
+
+class SqliteDb():
+    '''
+    Minimal select_dict db with dfs schema, counts queries
+
+    '''
+
+    def __init__(self):
+        self.con = sqlite3.connect(':memory:')
+        self.con.row_factory = sqlite3.Row
+        # stands in for postgres hashtext used by xref checksums
+        self.con.create_function('hashtext', 1, lambda s: zlib.crc32(s.encode()) - 2 ** 31)
+        self.con.execute("ATTACH DATABASE ':memory:' AS dfs")
+        self.con.execute('CREATE TABLE dfs.fb_mfl_xref (mfl_player_id, fb_player_id)')
+        self.con.execute('CREATE TABLE dfs.vw_fb_players '
+                         '(fb_player_id, source_player_name, dfs_position)')
+        self.con.executemany('INSERT INTO dfs.vw_fb_players VALUES (?, ?, ?)',
+                             [(1, 'Saquon Barkley', 'RB'), (2, 'Kenny Bell', 'WR')])
+        self.con.execute('INSERT INTO dfs.fb_mfl_xref VALUES (13604, 1)')
+        self.queries = 0
+
+    def select_dict(self, q):
+        self.queries += 1
+        return [dict(row) for row in self.con.execute(q)]
+
+
+class Snapshot_test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = SqliteDb()
+        self.fb = nx.Fanball(self.db, max_age=0)
+
+    def test_playersd(self):
+        self.assertEqual(self.fb.get_playersd('id')[2][0]['source_player_name'], 'Kenny Bell')
+        self.assertIn('Kenny Bell_WR', self.fb.get_playersd('namepos'))
+        with self.assertRaises(ValueError):
+            self.fb.get_playersd('ERR')
+
+    def test_cache(self):
+        self.assertEqual(self.fb.get_mfld(), {13604: 1})
+        self.fb.get_playersd('name')
+        queries = self.db.queries
+        self.fb.get_playersd('name')
+        self.fb.get_mfld()
+        # only version checks hit the db
+        self.assertEqual(self.db.queries, queries + 2)
+        self.db.con.execute("INSERT INTO dfs.vw_fb_players VALUES (3, 'Tom Brady', 'QB')")
+        self.assertIn('Tom Brady', self.fb.get_playersd('name'))
+        self.assertIs(nx.snapshot(self.db, 'dfs.vw_fb_players', max_age=0), self.fb._players)
+
+    def test_xref_update(self):
+        self.assertEqual(self.fb.get_mfld(), {13604: 1})
+        self.db.con.execute('UPDATE dfs.fb_mfl_xref SET fb_player_id = 99 '
+                            'WHERE mfl_player_id = 13604')
+        self.assertEqual(self.fb.get_mfld(), {13604: 99})
+
+    def test_snapshot_args(self):
+        nx.Fanball(self.db).get_players()
+        fb = nx.Fanball(self.db, max_age=0)
+        fb.get_players()
+        self.db.con.execute("INSERT INTO dfs.vw_fb_players VALUES (3, 'Tom Brady', 'QB')")
+        self.assertIn('Tom Brady', fb.get_playersd('name'))
+
+    def test_readonly(self):
+        d = self.fb.get_playersd('name')
+        with self.assertRaises(TypeError):
+            d['Tom Brady'] = []
+        with self.assertRaises(AttributeError):
+            d['Kenny Bell'].append({})
+        self.assertEqual(len(self.fb.get_playersd('name')['Kenny Bell']), 1)
+
+    def test_match_mfl(self):
+        players = [{'id': 13604, 'name': 'Barkley, Saquon'}, {'id': 1, 'name': 'Bell, Kenny'}]
+        players = self.fb.match_mfl(players, 'id', 'name')
+        self.assertEqual([p.get('fb_player_id') for p in players], [1, 2])
+        players = [{'id': 1, 'name': 'Bell, Kenny', 'pos': 'WR'}]
+        players = self.fb.match_mfl(players, 'id', 'name', pos_key='pos', batch=True)
+        self.assertEqual(players[0]['fb_player_id'], 2)
+
+
 if __name__ == '__main__':
     logging.basicConfig(stream=sys.stdout, level=logging.INFO)
     unittest.main()